@@ -0,0 +1,84 @@
+import contextlib
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import REGISTRY
+
+# How many inferences may run at once in this process. Their windows share
+# batched model calls, so the limit mainly bounds memory and latency
+DEFAULT_MAX_CONCURRENT = int(os.environ.get("TAB_GENER8OR_MAX_INFERENCES", "4"))
+
+INFERENCES_RUNNING = REGISTRY.gauge("inferences_running", "Conversions currently holding an inference slot.")
+INFERENCES_WAITING = REGISTRY.gauge("inferences_waiting", "Conversions queued for an inference slot.")
+INFERENCE_WAIT_SECONDS = REGISTRY.histogram(
+    "inference_wait_seconds", "Time conversions spent queued before inference started.")
+
+
+class AdmissionQueue:
+    """
+    Process-wide limit on concurrent inferences with a first-come, first-served queue.
+
+    Callers wrap the expensive section in ``with queue.slot(on_wait):``. At
+    most ``max_concurrent`` callers are inside at once; the rest wait in
+    arrival order and are told their position as it changes.
+    """
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT):
+        self.max_concurrent = max(1, max_concurrent)
+        self._cond = threading.Condition()
+        self._waiting = deque()
+        self._running = 0
+
+    @property
+    def running(self):
+        """Number of callers currently holding a slot."""
+        return self._running
+
+    @property
+    def waiting(self):
+        """Number of callers queued for a slot."""
+        return len(self._waiting)
+
+    @contextlib.contextmanager
+    def slot(self, on_wait=None):
+        """
+        Hold one inference slot for the duration of the block.
+
+        Args:
+            on_wait (callable, optional): on_wait(position) called with the
+                1-based queue position whenever it changes, and with 0 once
+                the slot is acquired after waiting
+        """
+        ticket = object()
+        waited = False
+        queued_at = time.perf_counter()
+        with self._cond:
+            self._waiting.append(ticket)
+            INFERENCES_WAITING.inc()
+            last_position = None
+            while self._running >= self.max_concurrent or self._waiting[0] is not ticket:
+                position = self._waiting.index(ticket) + 1
+                if on_wait is not None and position != last_position:
+                    on_wait(position)
+                    last_position = position
+                waited = True
+                self._cond.wait()
+            self._waiting.popleft()
+            self._running += 1
+            INFERENCES_WAITING.dec()
+            INFERENCES_RUNNING.inc()
+            # The next ticket may fit too when more than one slot is free
+            self._cond.notify_all()
+        INFERENCE_WAIT_SECONDS.observe(time.perf_counter() - queued_at)
+        if waited and on_wait is not None:
+            on_wait(0)
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                INFERENCES_RUNNING.dec()
+                self._cond.notify_all()
@@ -1,17 +1,23 @@
 import streamlit as st
 import os
-import sys
-import tempfile
-from io import StringIO
-import contextlib
-import time
 import logging
-from tayuya import MIDIParser
 import base64
-import re
 from pathlib import Path
 import html
-from basic_pitch.inference import predict
+import threading
+import contextlib
+import argparse
+import sys
+from transcriber import (AUDIO_EXTENSIONS, BACKENDS, DEFAULT_BACKEND, DEFAULT_INTER_OP_THREADS,
+                         DEFAULT_INTRA_OP_THREADS, Transcriber)
+from batching import DEFAULT_MAX_BATCH_SIZE
+from tabs import iter_formatted_tab, render_tab_section
+from result_cache import PCMCache, ResultCache
+from pipeline import convert_audio
+from jobs import JobQueue
+from admission import AdmissionQueue
+from profiling import Profiler, span
+from metrics import start_metrics_server
 
 # Configure logging to suppress Basic Pitch debug messages
 logging.getLogger().setLevel(logging.WARNING)
@@ -24,1099 +30,228 @@ if 'theme' not in st.session_state:
 if 'version' not in st.session_state:
     st.session_state.version = '1.0.0'  # App version
 
+if 'tab_engine' not in st.session_state:
+    st.session_state.tab_engine = 'native'
+
 if 'show_landing' not in st.session_state:
     st.session_state.show_landing = True
 
+if 'profile' not in st.session_state:
+    st.session_state.profile = False
+
 # Custom CSS to improve tablature display
 st.set_page_config(
-    page_title="MP3 to Guitar Tab Converter",
+    page_title="Audio to Guitar Tab Converter",
     page_icon="🎸",
     layout="wide"
 )
 
-# Dark theme CSS
-dark_css = """
-<style>
-body {
-    font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-    max-width: 100%;
-    margin: 0;
-    padding: 0;
-    background-color: #0a0a0a;
-    color: #ffffff;
-}
-
-.stApp {
-    max-width: 100vw;
-    background-color: #0a0a0a;
-}
-
-/* Hide Streamlit branding */
-#MainMenu, footer, header {
-    visibility: hidden;
-}
-
-/* Sidebar styling */
-.sidebar-content {
-    width: 25rem;
-    background-color: #0a0a0a;
-}
-
-[data-testid="stSidebar"] {
-    background-color: #0a0a0a !important;
-}
-
-[data-testid="stSidebarContent"] {
-    background-color: #0a0a0a !important;
-}
-
-/* Title and headings */
-h1, h2, h3, h4, h5, h6 {
-    font-weight: 700 !important;
-    color: #ffffff !important;
-}
-
-h1 {
-    font-size: 2.5rem !important;
-    letter-spacing: -0.025em !important;
-    margin-bottom: 2rem !important;
-}
-
-h2 {
-    font-size: 1.8rem !important;
-    margin-top: 2rem !important;
-}
-
-/* Standard text */
-p, li, div {
-    color: #e0e0e0;
-}
-
-/* Links */
-a {
-    color: #ff4d4d !important;
-    text-decoration: none !important;
-}
-
-a:hover {
-    text-decoration: underline !important;
-}
-
-/* Button styling */
-.stButton button {
-    background-color: #ff4d4d !important;
-    color: white !important;
-    border: none !important;
-    border-radius: 4px !important;
-    padding: 0.5rem 1.5rem !important;
-    font-weight: 600 !important;
-    transition: all 0.2s ease !important;
-}
-
-.stButton button:hover {
-    background-color: #e63939 !important;
-    transform: translateY(-2px);
-    box-shadow: 0 4px 12px rgba(255, 77, 77, 0.3);
-}
-
-/* Divider */
-hr {
-    border-color: #333333 !important;
-    margin: 2rem 0 !important;
-}
-
-/* File uploader */
-.stFileUploader {
-    background-color: #121212 !important;
-    border: 2px dashed #333333 !important;
-    border-radius: 8px !important;
-    padding: 1.5rem !important;
-    margin-bottom: 1.5rem !important;
-}
-
-/* Tablature styling */
-.tab-container {
-    font-family: 'Courier New', monospace;
-    font-size: 13px;
-    white-space: pre !important;
-    overflow-x: auto !important;
-    width: 100% !important;
-    max-width: 100% !important;
-    background-color: #121212 !important;
-    padding: 1.5rem !important;
-    border-radius: 8px !important;
-    border: 1px solid #333333 !important;
-    line-height: 1.2;
-    box-sizing: border-box !important;
-    display: block !important;
-    margin-top: 1rem !important;
-    color: #e0e0e0 !important;
-}
-
-.tab-instructions {
-    text-align: right;
-    margin-top: 0.5rem;
-    font-style: italic;
-    color: #999;
-}
-
-/* Success message */
-.stSuccess {
-    background-color: rgba(76, 175, 80, 0.2) !important;
-    color: #4CAF50 !important;
-    border: 1px solid #4CAF50 !important;
-}
-
-/* Error message */
-.stError {
-    background-color: rgba(255, 77, 77, 0.2) !important;
-    color: #ff4d4d !important;
-    border: 1px solid #ff4d4d !important;
-}
-
-/* Info message */
-.stInfo {
-    background-color: rgba(33, 150, 243, 0.2) !important;
-    color: #2196F3 !important;
-    border: 1px solid #2196F3 !important;
-}
-
-/* Download button styling */
-.download-btn {
-    display: inline-block;
-    background-color: #121212 !important;
-    color: white !important;
-    padding: 12px 24px !important;
-    text-align: center;
-    text-decoration: none !important;
-    border-radius: 4px !important;
-    border: 1px solid #ff4d4d !important;
-    cursor: pointer;
-    font-size: 16px;
-    margin-top: 1.5rem !important;
-    margin-bottom: 1.5rem !important;
-    transition: all 0.2s ease;
-    font-weight: 600;
-}
-
-.download-btn:hover {
-    background-color: #ff4d4d !important;
-    color: white !important;
-    transform: translateY(-2px);
-    box-shadow: 0 4px 12px rgba(255, 77, 77, 0.3);
-}
-
-/* Audio player styling */
-audio {
-    width: 100% !important;
-    margin: 1rem 0 !important;
-    border-radius: 8px !important;
-    background-color: #121212 !important;
-}
-
-/* Spinner */
-.stSpinner > div {
-    border-top-color: #ff4d4d !important;
-}
-
-/* Fix for tablature display */
-pre {
-    white-space: pre;
-    overflow-x: auto;
-    max-width: 100%;
-    font-size: 14px;
-    line-height: 1.3;
-    margin: 0;
-    padding: 0;
-    color: #e0e0e0 !important;
-}
-
-/* Blocks */
-.stBlock {
-    background-color: #121212 !important;
-    border-radius: 8px !important;
-    padding: 1.5rem !important;
-    margin: 1.5rem 0 !important;
-    border: 1px solid #333333 !important;
-}
-
-/* Theme toggle switch styling */
-.theme-toggle-container {
-    display: flex;
-    align-items: center;
-    margin-bottom: 1rem;
-}
-
-.theme-toggle-label {
-    margin-right: 10px;
-    color: #e0e0e0;
-}
-
-/* Tooltip styling */
-.tooltip {
-    position: relative;
-    display: inline-block;
-    cursor: help;
-}
-
-.tooltip .tooltiptext {
-    visibility: hidden;
-    width: 250px;
-    background-color: #1a1a1a;
-    color: #e0e0e0;
-    text-align: center;
-    border-radius: 6px;
-    padding: 10px;
-    position: absolute;
-    z-index: 1000;
-    bottom: 125%;
-    left: 50%;
-    margin-left: -125px;
-    opacity: 0;
-    transition: opacity 0.3s;
-    font-size: 14px;
-    font-weight: normal;
-    box-shadow: 0 5px 15px rgba(0, 0, 0, 0.5);
-    border: 1px solid #333333;
-    pointer-events: none;
-}
-
-.tooltip .tooltiptext::after {
-    content: "";
-    position: absolute;
-    top: 100%;
-    left: 50%;
-    margin-left: -5px;
-    border-width: 5px;
-    border-style: solid;
-    border-color: #1a1a1a transparent transparent transparent;
-}
-
-.tooltip:hover .tooltiptext {
-    visibility: visible;
-    opacity: 1;
-}
-
-/* Footer styling */
-.app-footer {
-    position: fixed;
-    bottom: 0;
-    left: 0;
-    width: 100%;
-    padding: 10px 20px;
-    background-color: #0a0a0a;
-    color: #666;
-    font-size: 12px;
-    text-align: center;
-    border-top: 1px solid #333;
-}
-
-/* Hero section styling */
-.hero-container {
-    position: relative;
-    width: 100%;
-    height: 500px;
-    overflow: hidden;
-    border-radius: 12px;
-    margin-bottom: 3rem;
-    background-color: #121212;
-    display: flex;
-    align-items: center;
-    justify-content: center;
-    box-shadow: 0 10px 30px rgba(0, 0, 0, 0.4);
-}
-
-.hero-image {
-    position: absolute;
-    width: 100%;
-    height: 100%;
-    object-fit: cover;
-    opacity: 0.5;
-}
-
-.hero-content {
-    position: relative;
-    z-index: 2;
-    text-align: center;
-    padding: 0 2rem;
-    max-width: 800px;
-}
-
-.hero-title {
-    font-size: 3.5rem !important;
-    margin-bottom: 1rem !important;
-    color: #ffffff !important;
-    text-shadow: 0 2px 10px rgba(0, 0, 0, 0.7);
-}
-
-.hero-subtitle {
-    font-size: 1.5rem;
-    margin-bottom: 2rem;
-    color: #e0e0e0;
-    text-shadow: 0 2px 8px rgba(0, 0, 0, 0.7);
-}
-
-.cta-button {
-    background-color: #ff4d4d;
-    color: white;
-    border: none;
-    border-radius: 4px;
-    padding: 12px 28px;
-    font-size: 1.2rem;
-    font-weight: 600;
-    cursor: pointer;
-    transition: all 0.3s ease;
-    box-shadow: 0 4px 12px rgba(255, 77, 77, 0.5);
-}
-
-.cta-button:hover {
-    background-color: #e63939;
-    transform: translateY(-2px);
-    box-shadow: 0 6px 16px rgba(255, 77, 77, 0.6);
-}
-
-/* Mobile responsiveness */
-@media (max-width: 768px) {
-    h1 {
-        font-size: 1.8rem !important;
-    }
-    
-    .download-btn {
-        padding: 8px 16px !important;
-        font-size: 14px;
-        width: 100%;
-        text-align: center;
-    }
-    
-    .tab-container {
-        padding: 0.8rem !important;
-    }
-    
-    .hero-title {
-        font-size: 2.5rem !important;
-    }
-    
-    .hero-subtitle {
-        font-size: 1.2rem !important;
-    }
-    
-    .cta-button {
-        padding: 12px 24px;
-        font-size: 1rem;
-    }
-}
-
-/* Audio visualizer */
-.audio-player-container {
-    width: 100%;
-    background-color: #121212;
-    border-radius: 8px;
-    padding: 15px;
-    margin: 15px 0;
-    border: 1px solid #333333;
-}
-
-.waveform {
-    width: 100%;
-    height: 100px;
-    margin-bottom: 10px;
-    background-color: #121212;
-}
-
-.audio-controls {
-    display: flex;
-    align-items: center;
-    justify-content: space-between;
-    margin-top: 10px;
-}
-
-.audio-control-button {
-    background-color: #ff4d4d;
-    color: white;
-    border: none;
-    border-radius: 50%;
-    width: 40px;
-    height: 40px;
-    font-size: 16px;
-    cursor: pointer;
-    display: flex;
-    align-items: center;
-    justify-content: center;
-    transition: all 0.2s ease;
-    margin-right: 10px;
-}
-
-.audio-control-button:hover {
-    background-color: #e63939;
-    transform: scale(1.05);
-}
-
-.audio-time {
-    font-family: 'Inter', sans-serif;
-    font-size: 14px;
-    color: #e0e0e0;
-    margin: 0 10px;
-}
-
-.audio-progress {
-    flex-grow: 1;
-    height: 5px;
-    background-color: #333333;
-    border-radius: 3px;
-    position: relative;
-    cursor: pointer;
-}
-
-.audio-progress-bar {
-    height: 100%;
-    background-color: #ff4d4d;
-    border-radius: 3px;
-    width: 0%;
-}
-
-.audio-volume-container {
-    display: flex;
-    align-items: center;
-    margin-left: 15px;
-}
-
-.audio-volume {
-    width: 80px;
-    height: 5px;
-    background-color: #333333;
-    border-radius: 3px;
-    position: relative;
-    cursor: pointer;
-}
-
-.audio-volume-bar {
-    height: 100%;
-    background-color: #ff4d4d;
-    border-radius: 3px;
-    width: 70%;
-}
-</style>
-"""
-
-# Light theme CSS
-light_css = """
-<style>
-body {
-    font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-    max-width: 100%;
-    margin: 0;
-    padding: 0;
-    background-color: #ffffff;
-    color: #333333;
-}
-
-.stApp {
-    max-width: 100vw;
-    background-color: #ffffff;
-}
-
-/* Hide Streamlit branding */
-#MainMenu, footer, header {
-    visibility: hidden;
-}
-
-/* Sidebar styling */
-.sidebar-content {
-    width: 25rem;
-    background-color: #ffffff;
-}
-
-[data-testid="stSidebar"] {
-    background-color: #ffffff !important;
-}
-
-[data-testid="stSidebarContent"] {
-    background-color: #ffffff !important;
-}
-
-/* Title and headings */
-h1, h2, h3, h4, h5, h6 {
-    font-weight: 700 !important;
-    color: #1a1a1a !important;
-}
-
-h1 {
-    font-size: 2.5rem !important;
-    letter-spacing: -0.025em !important;
-    margin-bottom: 2rem !important;
-}
-
-h2 {
-    font-size: 1.8rem !important;
-    margin-top: 2rem !important;
-}
-
-/* Standard text */
-p, li, div {
-    color: #444444;
-}
+# Theme stylesheets and the hero image live in ./static, which Streamlit serves
+# at app/static/ when server.enableStaticServing is on
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_URL = "app/static"
+HERO_IMAGE = "player-piano-7.png"
 
-/* Links */
-a {
-    color: #ff4d4d !important;
-    text-decoration: none !important;
-}
-
-a:hover {
-    text-decoration: underline !important;
-}
-
-/* Button styling */
-.stButton button {
-    background-color: #ff4d4d !important;
-    color: white !important;
-    border: none !important;
-    border-radius: 4px !important;
-    padding: 0.5rem 1.5rem !important;
-    font-weight: 600 !important;
-    transition: all 0.2s ease !important;
-}
-
-.stButton button:hover {
-    background-color: #e63939 !important;
-    transform: translateY(-2px);
-    box-shadow: 0 4px 12px rgba(255, 77, 77, 0.3);
-}
-
-/* Divider */
-hr {
-    border-color: #e0e0e0 !important;
-    margin: 2rem 0 !important;
-}
-
-/* File uploader */
-.stFileUploader {
-    background-color: #f8f9fa !important;
-    border: 2px dashed #dddddd !important;
-    border-radius: 8px !important;
-    padding: 1.5rem !important;
-    margin-bottom: 1.5rem !important;
-}
-
-/* Tablature styling */
-.tab-container {
-    font-family: 'Courier New', monospace;
-    font-size: 13px;
-    white-space: pre !important;
-    overflow-x: auto !important;
-    width: 100% !important;
-    max-width: 100% !important;
-    background-color: #f8f9fa !important;
-    padding: 1.5rem !important;
-    border-radius: 8px !important;
-    border: 1px solid #dee2e6 !important;
-    line-height: 1.2;
-    box-sizing: border-box !important;
-    display: block !important;
-    margin-top: 1rem !important;
-    color: #333333 !important;
-}
-
-.tab-instructions {
-    text-align: right;
-    margin-top: 0.5rem;
-    font-style: italic;
-    color: #999;
-}
-
-/* Success message */
-.stSuccess {
-    background-color: rgba(76, 175, 80, 0.1) !important;
-    color: #4CAF50 !important;
-    border: 1px solid #4CAF50 !important;
-}
-
-/* Error message */
-.stError {
-    background-color: rgba(255, 77, 77, 0.1) !important;
-    color: #ff4d4d !important;
-    border: 1px solid #ff4d4d !important;
-}
-
-/* Info message */
-.stInfo {
-    background-color: rgba(33, 150, 243, 0.1) !important;
-    color: #2196F3 !important;
-    border: 1px solid #2196F3 !important;
-}
-
-/* Download button styling */
-.download-btn {
-    display: inline-block;
-    background-color: #ffffff !important;
-    color: #ff4d4d !important;
-    padding: 12px 24px !important;
-    text-align: center;
-    text-decoration: none !important;
-    border-radius: 4px !important;
-    border: 1px solid #ff4d4d !important;
-    cursor: pointer;
-    font-size: 16px;
-    margin-top: 1.5rem !important;
-    margin-bottom: 1.5rem !important;
-    transition: all 0.2s ease;
-    font-weight: 600;
-}
-
-.download-btn:hover {
-    background-color: #ff4d4d !important;
-    color: white !important;
-    transform: translateY(-2px);
-    box-shadow: 0 4px 12px rgba(255, 77, 77, 0.3);
-}
-
-/* Audio player styling */
-audio {
-    width: 100% !important;
-    margin: 1rem 0 !important;
-    border-radius: 8px !important;
-    background-color: #f8f9fa !important;
-}
-
-/* Spinner */
-.stSpinner > div {
-    border-top-color: #ff4d4d !important;
-}
-
-/* Fix for tablature display */
-pre {
-    white-space: pre;
-    overflow-x: auto;
-    max-width: 100%;
-    font-size: 13px;
-    margin: 0;
-    padding: 0;
-    color: #333333 !important;
-}
-
-/* Blocks */
-.stBlock {
-    background-color: #f8f9fa !important;
-    border-radius: 8px !important;
-    padding: 1.5rem !important;
-    margin: 1.5rem 0 !important;
-    border: 1px solid #dee2e6 !important;
-}
-
-/* Theme toggle switch styling */
-.theme-toggle-container {
-    display: flex;
-    align-items: center;
-    margin-bottom: 1rem;
-}
-
-.theme-toggle-label {
-    margin-right: 10px;
-    color: #333333;
-}
-
-/* Tooltip styling */
-.tooltip {
-    position: relative;
-    display: inline-block;
-    cursor: help;
-}
-
-.tooltip .tooltiptext {
-    visibility: hidden;
-    width: 250px;
-    background-color: #ffffff;
-    color: #333333;
-    text-align: center;
-    border-radius: 6px;
-    padding: 10px;
-    position: absolute;
-    z-index: 1000;
-    bottom: 125%;
-    left: 50%;
-    margin-left: -125px;
-    opacity: 0;
-    transition: opacity 0.3s;
-    font-size: 14px;
-    font-weight: normal;
-    box-shadow: 0 5px 15px rgba(0, 0, 0, 0.1);
-    border: 1px solid #dee2e6;
-    pointer-events: none;
-}
-
-.tooltip .tooltiptext::after {
-    content: "";
-    position: absolute;
-    top: 100%;
-    left: 50%;
-    margin-left: -5px;
-    border-width: 5px;
-    border-style: solid;
-    border-color: #ffffff transparent transparent transparent;
-}
-
-.tooltip:hover .tooltiptext {
-    visibility: visible;
-    opacity: 1;
-}
-
-/* Footer styling */
-.app-footer {
-    position: fixed;
-    bottom: 0;
-    left: 0;
-    width: 100%;
-    padding: 10px 20px;
-    background-color: #ffffff;
-    color: #999;
-    font-size: 12px;
-    text-align: center;
-    border-top: 1px solid #eee;
-}
-
-/* Hero section styling */
-.hero-container {
-    position: relative;
-    width: 100%;
-    height: 500px;
-    overflow: hidden;
-    border-radius: 12px;
-    margin-bottom: 3rem;
-    background-color: #f8f9fa;
-    display: flex;
-    align-items: center;
-    justify-content: center;
-    box-shadow: 0 10px 30px rgba(0, 0, 0, 0.1);
-}
-
-.hero-image {
-    position: absolute;
-    width: 100%;
-    height: 100%;
-    object-fit: cover;
-    opacity: 0.7;
-}
-
-.hero-content {
-    position: relative;
-    z-index: 2;
-    text-align: center;
-    padding: 0 2rem;
-    max-width: 800px;
-}
-
-.hero-title {
-    font-size: 3.5rem !important;
-    margin-bottom: 1rem !important;
-    color: #1a1a1a !important;
-    text-shadow: 0 2px 10px rgba(255, 255, 255, 0.7);
-}
-
-.hero-subtitle {
-    font-size: 1.5rem;
-    margin-bottom: 2rem;
-    color: #333333;
-    text-shadow: 0 2px 8px rgba(255, 255, 255, 0.7);
-}
-
-.cta-button {
-    background-color: #ff4d4d;
-    color: white;
-    border: none;
-    border-radius: 4px;
-    padding: 12px 28px;
-    font-size: 1.2rem;
-    font-weight: 600;
-    cursor: pointer;
-    transition: all 0.3s ease;
-    box-shadow: 0 4px 12px rgba(255, 77, 77, 0.5);
-}
-
-.cta-button:hover {
-    background-color: #e63939;
-    transform: translateY(-2px);
-    box-shadow: 0 6px 16px rgba(255, 77, 77, 0.6);
-}
+def parse_model_args():
+    """
+    Model options passed after ``--`` on the Streamlit command line, e.g.
+    ``streamlit run app.py -- --backend onnx --threads 2``; the environment
+    variables are the defaults.
+    """
+    parser = argparse.ArgumentParser(prog="app.py")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND)
+    parser.add_argument("--threads", type=int, default=DEFAULT_INTRA_OP_THREADS)
+    parser.add_argument("--inter-op-threads", type=int, default=DEFAULT_INTER_OP_THREADS)
+    args, _ = parser.parse_known_args(sys.argv[1:])
+    return args
+
+@st.cache_resource(show_spinner=False)
+def get_transcriber():
+    """Load and warm the Basic Pitch model once per process, shared by every session."""
+    args = parse_model_args()
+    # Windows from concurrent sessions are batched into shared model calls
+    return Transcriber(max_batch_size=DEFAULT_MAX_BATCH_SIZE, pcm_cache=PCMCache(), backend=args.backend,
+                       intra_op_threads=args.threads, inter_op_threads=args.inter_op_threads).warm_up()
+
+@st.cache_resource(show_spinner=False)
+def start_model_warm_up():
+    """
+    Load the model on a background thread, once per process.
+    TensorFlow is only imported here, so the first page paints before it loads; a conversion
+    started meanwhile simply waits on the same cached get_transcriber() call.
+    """
+    thread = threading.Thread(target=get_transcriber, name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
 
-/* Mobile responsiveness */
-@media (max-width: 768px) {
-    h1 {
-        font-size: 1.8rem !important;
-    }
-    
-    .download-btn {
-        padding: 8px 16px !important;
-        font-size: 14px;
-        width: 100%;
-        text-align: center;
-    }
-    
-    .tab-container {
-        padding: 0.8rem !important;
-    }
+@st.cache_resource(show_spinner=False)
+def start_metrics_endpoint():
+    """
+    Serve Prometheus metrics once per process, on TAB_GENER8OR_METRICS_HOST:TAB_GENER8OR_METRICS_PORT
+    (default 127.0.0.1:9464; port 0 disables it).
+    """
+    return start_metrics_server()
+
+@st.cache_resource(show_spinner=False)
+def get_result_cache():
+    """Open the on-disk conversion cache once per process."""
+    return ResultCache()
+
+# Share of the progress bar and status message for each pipeline stage
+STAGE_PROGRESS = {
+    "decode": (0, 10, "🎧 Decoding audio..."),
+    "inference": (10, 80, "🎵 Analyzing audio using Basic Pitch..."),
+    "notes": (80, 90, "🎼 Extracting notes..."),
+    "tabs": (90, 100, "🎸 Generating guitar tablature..."),
+}
+
+def stage_progress(stage, fraction):
+    """Map a pipeline progress(stage, fraction) event to an overall percentage and status message."""
+    if stage is None:
+        return 0, "Starting conversion process..."
+    start, end, label = STAGE_PROGRESS[stage]
+    return int(start + (end - start) * fraction), label
+
+@st.cache_resource(show_spinner=False)
+def get_admission_queue():
+    """Limit concurrent inferences across every session (TAB_GENER8OR_MAX_INFERENCES, default 4)."""
+    return AdmissionQueue()
+
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    """Worker pool shared by every session, so jobs survive reruns and page refreshes."""
+    return JobQueue()
+
+def process_audio(audio_bytes, filename, transcriber, cache, admission, tab_engine="native",
+                  profiler=None, progress=None, on_segment=None, on_wait=None):
+    """
+    Process uploaded audio to generate MIDI and tablature, reporting progress(stage, fraction).
+    on_segment(start_s, end_s, note_events) receives partial notes as inference proceeds, and
+    on_wait(position) the queue position while waiting for an inference slot.
+    Runs on a job worker thread, so the shared transcriber, cache and admission queue are passed in.
+    With a Profiler, the result's "profile" holds the time and memory spent in each stage.
+    """
+    base_name, suffix = os.path.splitext(os.path.basename(filename))
+    midi_filename = f"{base_name}.mid"
+    with profiler.activate() if profiler is not None else contextlib.nullcontext():
+        # The extension tells the fallback decoder what it's reading
+        results = convert_audio(audio_bytes, transcriber, cache, admission, tab_engine, suffix or ".mp3",
+                                progress=progress, on_segment=on_segment, on_wait=on_wait)
+        # Escape the tab for display and encode it for download once per result, not on every rerun
+        with span("display_format"):
+            if results.get("tab_notes") is not None:
+                # Native tabs are already rendered to display width
+                display_tab = html.escape(results["tabs"])
+            else:
+                # Reflow and escape part by part instead of copying the whole tab at each step
+                display_tab = "".join(html.escape(chunk) for chunk in iter_formatted_tab(results["tabs"]))
+            tab_bytes = results["tabs"].encode()
+    results = {**results, "midi_filename": midi_filename, "display_tab": display_tab, "tab_bytes": tab_bytes}
+    if profiler is not None:
+        results["profile"] = profiler.to_dict()
+    return results
+
+@st.fragment(run_every=1.0)
+def render_job_progress(job_id):
+    """Poll a running job, showing its progress and tab preview; reruns the page once it finishes."""
+    job = get_job_queue().get(job_id)
+    if job is None or job.done:
+        st.rerun()
     
-    .hero-title {
-        font-size: 2.5rem !important;
-    }
+    if job.status == "queued":
+        st.info(f"⏳ Waiting for a free worker to convert {job.name}...")
+        return
+    if job.queue_position > 0:
+        ahead = job.queue_position - 1
+        st.info(f"⏳ {job.name} is #{job.queue_position} in the queue "
+                f"({ahead} conversion{'s' if ahead != 1 else ''} waiting ahead of it)...")
+        return
     
-    .hero-subtitle {
-        font-size: 1.2rem !important;
-    }
+    percent, label = stage_progress(job.stage, job.fraction)
+    st.progress(percent)
+    st.info(label)
     
-    .cta-button {
-        padding: 12px 24px;
-        font-size: 1rem;
-    }
-}
-
-/* Audio visualizer */
-.audio-player-container {
-    width: 100%;
-    background-color: #f8f9fa;
-    border-radius: 8px;
-    padding: 15px;
-    margin: 15px 0;
-    border: 1px solid #dee2e6;
-}
-
-.waveform {
-    width: 100%;
-    height: 100px;
-    margin-bottom: 10px;
-    background-color: #f8f9fa;
-}
-
-.audio-controls {
-    display: flex;
-    align-items: center;
-    justify-content: space-between;
-    margin-top: 10px;
-}
-
-.audio-control-button {
-    background-color: #ff4d4d;
-    color: white;
-    border: none;
-    border-radius: 50%;
-    width: 40px;
-    height: 40px;
-    font-size: 16px;
-    cursor: pointer;
-    display: flex;
-    align-items: center;
-    justify-content: center;
-    transition: all 0.2s ease;
-    margin-right: 10px;
-}
-
-.audio-control-button:hover {
-    background-color: #e63939;
-    transform: scale(1.05);
-}
-
-.audio-time {
-    font-family: 'Inter', sans-serif;
-    font-size: 14px;
-    color: #333333;
-    margin: 0 10px;
-}
-
-.audio-progress {
-    flex-grow: 1;
-    height: 5px;
-    background-color: #dee2e6;
-    border-radius: 3px;
-    position: relative;
-    cursor: pointer;
-}
-
-.audio-progress-bar {
-    height: 100%;
-    background-color: #ff4d4d;
-    border-radius: 3px;
-    width: 0%;
-}
-
-.audio-volume-container {
-    display: flex;
-    align-items: center;
-    margin-left: 15px;
-}
-
-.audio-volume {
-    width: 80px;
-    height: 5px;
-    background-color: #dee2e6;
-    border-radius: 3px;
-    position: relative;
-    cursor: pointer;
-}
-
-.audio-volume-bar {
-    height: 100%;
-    background-color: #ff4d4d;
-    border-radius: 3px;
-    width: 70%;
-}
-</style>
-"""
-
-# Helper function to capture stdout
-@contextlib.contextmanager
-def capture_stdout():
-    stdout = sys.stdout
-    string_io = StringIO()
-    sys.stdout = string_io
-    yield string_io
-    sys.stdout = stdout
+    # Native tabs are shown segment by segment while inference continues
+    for start_s, end_s, section in list(job.segments):
+        if not section:
+            continue
+        st.markdown(f"""
+        <div class="tab-container">
+            <small>{start_s:.0f}s – {end_s:.0f}s (preview)</small>
+            <pre>{html.escape(section)}</pre>
+        </div>
+        """, unsafe_allow_html=True)
 
-def process_audio(audio_file):
-    """Process an audio file to generate MIDI and tablature."""
-    with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as tmp_audio:
-        # Write uploaded file to a temporary file
-        tmp_audio.write(audio_file.getvalue())
-        tmp_audio_path = tmp_audio.name
-    
-    with tempfile.NamedTemporaryFile(suffix='.mid', delete=False) as tmp_midi:
-        tmp_midi_path = tmp_midi.name
+def render_job_result(job):
+    """Show the downloads and tab of a finished job, or its error."""
+    if job.status == "failed":
+        st.error(f"An error occurred: {job.error}")
+        st.info("Please try with a different audio file or ensure it is not corrupted.")
+        return
     
-    try:
-        with st.spinner("🎵 Analyzing audio using Basic Pitch..."):
-            # Suppress stdout for Basic Pitch prediction
-            with contextlib.redirect_stdout(StringIO()):
-                # 1. mp3 ➜ midi (in-memory)
-                model_out, midi_data, note_events = predict(tmp_audio_path)
-            # Save MIDI to temporary file
-            midi_data.write(tmp_midi_path)
+    results = job.result
+    if results and "tabs" in results and len(results["tabs"].strip()) > 0:
+        st.success("🎉 Conversion successful! Guitar tab has been generated.")
         
-        with st.spinner("🎸 Generating guitar tablature..."):
-            # 2. midi ➜ tab (focusing on track 1 which contains the note data)
-            # Since render_tabs() returns None but prints to stdout, we'll capture the output
-            mid = MIDIParser(tmp_midi_path, track=1)  # Track 1 has the notes
-            
-            with capture_stdout() as captured:
-                mid.render_tabs()
-                tabs = captured.getvalue()
+        # Streamlit serves the bytes over HTTP only when a button is clicked; they
+        # are registered once per result instead of being inlined on every rerun
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "⬇️ Download MIDI File",
+                data=results["midi_bytes"],
+                file_name=results["midi_filename"],
+                mime="audio/midi",
+                key=f"download-midi-{job.id}",
+                use_container_width=True,
+            )
         
-        # Read the MIDI file for download
-        with open(tmp_midi_path, "rb") as f:
-            midi_bytes = f.read()
+        with col2:
+            st.download_button(
+                "⬇️ Download Tab as Text File",
+                data=results["tab_bytes"],
+                file_name=results["midi_filename"].replace(".mid", ".txt"),
+                mime="text/plain",
+                key=f"download-tab-{job.id}",
+                use_container_width=True,
+            )
         
-        return {
-            "tabs": tabs,
-            "midi_bytes": midi_bytes,
-            "midi_filename": os.path.basename(audio_file.name).replace(".mp3", ".mid")
-        }
-    
-    finally:
-        # Clean up temporary files
-        try:
-            os.unlink(tmp_audio_path)
-            os.unlink(tmp_midi_path)
-        except:
-            pass
-
-def format_tab_for_display(tab_text):
-    """
-    Format tablature text to better fit screen width.
-    
-    Args:
-        tab_text (str): The raw tablature text
+        # Display the tab with a better heading
+        st.subheader("Guitar Tablature")                
         
-    Returns:
-        str: Formatted tablature text with properly split lines
-    """
-    # Clean up any ANSI escape codes or terminal control sequences
-    tab_text = re.sub(r'\x1B\[[0-9;]*[mK]', '', tab_text)
-    
-    lines = tab_text.strip().split('\n')
-    if not lines:
-        return tab_text
-    
-    # Identify guitar string lines (usually have string names like "e|---" or "E|---")
-    formatted_lines = []
-    i = 0
-    
-    while i < len(lines):
-        # Check if we have at least 6 lines (standard guitar tab)
-        if i + 5 < len(lines) and all('|' in line for line in lines[i:i+6]):
-            chunk = lines[i:i+6]
-            
-            # Find max line length in this chunk
-            max_length = max(len(line) for line in chunk)
-            
-            # If lines are too long, split them into smaller segments
-            if max_length > 100:  # Increased from 80 to 100 for better display
-                # How many segments we need
-                segment_width = 100
-                segments = (max_length + segment_width - 1) // segment_width
-                
-                for seg in range(segments):
-                    start = seg * segment_width
-                    end = min(start + segment_width, max_length)
-                    
-                    # Don't create empty segments
-                    if start >= len(chunk[0]):
-                        break
-                        
-                    # Extract the segment from each string line
-                    segment_lines = []
-                    for line in chunk:
-                        # Make sure we include the string name (E, A, D, G, B, e) in each segment
-                        if seg > 0 and '|' in line:
-                            # Find the string identifier and separator
-                            separator_index = line.index('|')
-                            prefix = line[:separator_index + 1]
-                            
-                            # Create segment with the prefix
-                            if start < len(line):
-                                # Get content after prefix, starting from our segment start
-                                # Calculate offset correctly to avoid cutting in wrong place
-                                content_start = start - separator_index - 1
-                                if content_start < 0:
-                                    content_start = 0
-                                content_part = line[separator_index+1:]
-                                if content_start < len(content_part):
-                                    segment = prefix + content_part[content_start:content_start+segment_width]
-                                else:
-                                    segment = prefix
-                            else:
-                                segment = prefix
-                        else:
-                            # First segment or line without separator
-                            segment = line[start:end] if start < len(line) else ''
-                        
-                        segment_lines.append(segment)
-                    
-                    # Add a segment label for clarity
-                    if segments > 1:
-                        segment_lines.insert(0, f"--- Part {seg+1}/{segments} ---")
-                    
-                    formatted_lines.extend(segment_lines)
-                    
-                    # Add a blank line between segments
-                    if seg < segments - 1:
-                        formatted_lines.append("")
-            else:
-                # Lines are short enough, no need to split
-                formatted_lines.extend(chunk)
-            
-            # Add a blank line after each chunk of 6 lines
-            formatted_lines.append("")
-            i += 6
-        else:
-            # If it's not a complete chunk of 6 lines, just add the line as is
-            formatted_lines.append(lines[i])
-            i += 1
-    
-    # Just return the formatted text - the container will be added by the calling function
-    return '\n'.join(formatted_lines)
-
-def get_download_link(binary_file, filename, text, class_name=""):
-    """Generate a download link for a binary file."""
-    b64 = base64.b64encode(binary_file).decode()
-    href = f'<a href="data:application/octet-stream;base64,{b64}" download="{filename}" class="download-btn {class_name}">{text}</a>'
-    return href
+        # Create a full-width container for the tab
+        tab_container = st.container()
+        with tab_container:
+            # Use a monospace pre tag for better rendering with proper HTML escaping
+            st.markdown(f"""
+            <div class="tab-container">
+                <pre>{results["display_tab"]}</pre>
+                <div class="tab-instructions">
+                    <small>Scroll horizontally to see more ➡️</small>
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+    else:
+        st.error("Failed to generate guitar tab. The audio may not contain distinct notes or may be too complex.")
+        st.info("Try with a cleaner recording or a simpler melody for better results.")
+
+def render_profile(profile):
+    """Show a conversion's per-stage timings and memory as a table."""
+    rows = [
+        {
+            "Stage": name,
+            "Calls": stats["calls"],
+            "Wall (s)": round(stats["wall_s"], 3),
+            "CPU (s)": round(stats["cpu_s"], 3),
+            "Peak (MiB)": round(stats["peak_mb"], 1) if stats["peak_mb"] is not None else None,
+        }
+        for name, stats in profile["stages"].items()
+    ]
+    st.table(rows)
+    if profile.get("memory_overlapped"):
+        st.caption("Peak memory isn't shown: another profiled conversion ran at the same time.")
+    if profile["peak_rss_mb"] is not None:
+        st.caption(f"Process peak RSS: {profile['peak_rss_mb']:.0f} MiB")
 
 def add_tooltip(text, tooltip_text):
     """Add a tooltip to any text element"""
@@ -1127,33 +262,44 @@ def get_image_as_base64(image_path):
     with open(image_path, "rb") as img_file:
         return base64.b64encode(img_file.read()).decode()
 
+@st.cache_resource(show_spinner=False)
+def get_theme_css(theme):
+    """
+    Build the tag that applies a theme's stylesheet, once per process.
+    Links to the static file when static serving is on, so reruns send a one-line tag
+    instead of the whole stylesheet; otherwise the file is inlined.
+    """
+    filename = f"{theme}.css"
+    if st.get_option("server.enableStaticServing"):
+        return f'<link rel="stylesheet" href="{STATIC_URL}/{filename}">'
+    with open(os.path.join(STATIC_DIR, filename)) as f:
+        return f"<style>\n{f.read()}</style>"
+
+@st.cache_resource(show_spinner=False)
+def get_hero_image_html():
+    """Resolve and encode the hero image once per process; served as a static file when possible."""
+    alt = "Mechanical hands playing piano"
+    if st.get_option("server.enableStaticServing") and os.path.exists(os.path.join(STATIC_DIR, HERO_IMAGE)):
+        return f'<img src="{STATIC_URL}/{HERO_IMAGE}" class="hero-image" alt="{alt}">'
+    
+    # Without static serving, inline the first copy found as a data URI
+    possible_paths = [
+        os.path.join(STATIC_DIR, HERO_IMAGE),
+        f"assets/images/{HERO_IMAGE}",
+        f"images/{HERO_IMAGE}",
+        f"assets/{HERO_IMAGE}",
+        f"../{HERO_IMAGE}"
+    ]
+    for path in possible_paths:
+        if os.path.exists(path):
+            img_base64 = get_image_as_base64(path)
+            return f'<img src="data:image/png;base64,{img_base64}" class="hero-image" alt="{alt}">'
+    # Fallback if image not found
+    return ""
+
 def render_hero_section():
     """Render the landing page hero section with background image"""
-    # Check if player-piano-7.png exists in the assets/images directory
-    image_path = "assets/images/player-piano-7.png"
-    
-    # Try to locate the image file
-    if not os.path.exists(image_path):
-        # If not in current directory, check common image directories
-        possible_paths = [
-            "images/player-piano-7.png",
-            "static/player-piano-7.png",
-            "assets/player-piano-7.png",
-            "../player-piano-7.png"
-        ]
-        
-        for path in possible_paths:
-            if os.path.exists(path):
-                image_path = path
-                break
-    
-    if os.path.exists(image_path):
-        # Convert image to base64 for inline embedding
-        img_base64 = get_image_as_base64(image_path)
-        img_html = f'<img src="data:image/png;base64,{img_base64}" class="hero-image" alt="Mechanical hands playing piano">'
-    else:
-        # Fallback if image not found
-        img_html = ""
+    img_html = get_hero_image_html()
     
     hero_html = f"""
     <div class="hero-container">
@@ -1179,7 +325,7 @@ def main():
         # Help section
         st.subheader("ℹ️ How to use")
         st.markdown("""
-        1. Upload your MP3 guitar recording
+        1. Upload your guitar recording (MP3, WAV, FLAC, OGG or M4A)
         2. Click "Convert to Guitar Tab"
         3. View and download the generated tab
         """)
@@ -1196,13 +342,13 @@ def main():
         # About section
         st.subheader("🧠 How it works")
         tooltip_pitch = "Uses machine learning to analyze audio and detect musical notes and their timing, converting audio to structured MIDI data."
-        tooltip_tayuya = "Processes MIDI data to generate guitar-specific tablature notation, determining string and fret positions."
+        tooltip_tabs = "Maps each detected note to a string and fret position and renders them as guitar tablature. Tayuya is available as a legacy engine."
         
         pitch_text = add_tooltip("Basic Pitch", tooltip_pitch)
-        tayuya_text = add_tooltip("Tayuya", tooltip_tayuya)
+        tabs_text = add_tooltip("a tab engine", tooltip_tabs)
         
         st.markdown(f"""
-        This app uses {pitch_text} for audio-to-MIDI conversion and {tayuya_text} for MIDI-to-tablature rendering.
+        This app uses {pitch_text} for audio-to-MIDI conversion and {tabs_text} for note-to-tablature rendering.
         """, unsafe_allow_html=True)
 
         st.subheader("Settings")
@@ -1213,6 +359,17 @@ def main():
         # Update session state based on selection
         st.session_state.theme = 'dark' if selected_theme == "Dark Mode" else 'light'
         
+        engine_options = {"Native": "native", "Tayuya (legacy)": "tayuya"}
+        selected_engine = st.radio("Tab Engine:", list(engine_options),
+                                   index=list(engine_options.values()).index(st.session_state.tab_engine))
+        st.session_state.tab_engine = engine_options[selected_engine]
+        
+        # Stage timings of the latest conversion are filled in below once it finishes
+        debug_expander = st.expander("🐞 Debug")
+        with debug_expander:
+            st.checkbox("Profile conversions", key="profile",
+                        help="Record wall time, CPU time and peak memory for each stage of the next conversion.")
+        
         # if st.session_state.show_landing:
         #     if st.button("Hide Landing Page"):
         #         st.session_state.show_landing = False
@@ -1225,10 +382,7 @@ def main():
         
     
     # Apply the appropriate CSS based on theme choice
-    if st.session_state.theme == 'dark':
-        st.markdown(dark_css, unsafe_allow_html=True)
-    else:
-        st.markdown(light_css, unsafe_allow_html=True)
+    st.markdown(get_theme_css(st.session_state.theme), unsafe_allow_html=True)
     
     # Custom CSS to make the main content area wider
     st.markdown("""
@@ -1249,7 +403,7 @@ def main():
         st.markdown('<div id="get-started"></div>', unsafe_allow_html=True)
     
     # Always show the main app content after the hero section (or immediately if hero is hidden)
-    st.title("🎸 MP3 to Guitar Tab Converter")
+    st.title("🎸 Audio to Guitar Tab Converter")
     
     st.write("""
     Transform your guitar recordings into easy-to-read tablature. Perfect for documenting your riffs, 
@@ -1257,8 +411,8 @@ def main():
     """)
     
     # File uploader with custom styling
-    file_uploader_label = "Choose an MP3 file"
-    uploaded_file = st.file_uploader(file_uploader_label, type=['mp3'])
+    file_uploader_label = "Choose an audio file"
+    uploaded_file = st.file_uploader(file_uploader_label, type=[ext.lstrip(".") for ext in AUDIO_EXTENSIONS])
     
     if uploaded_file is not None:
         # Show the file information with a remove option
@@ -1284,82 +438,39 @@ def main():
         with col1:
             # Audio preview section
             st.subheader("Audio Preview")
-            st.audio(uploaded_file, format="audio/mp3")
+            st.audio(uploaded_file, format=uploaded_file.type or "audio/mpeg")
             st.caption("Note: Processing large audio files may take longer")
             
             # Convert button with full width and better styling
             convert_button = st.button("Convert to Guitar Tab", use_container_width=True, type="primary")
         
         if convert_button:
-            try:
-                # Add a progress bar
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                # Process in stages
-                status_text.info("Starting conversion process...")
-                progress_bar.progress(10)
-                time.sleep(0.5)
-                
-                status_text.info("Converting audio to MIDI...")
-                progress_bar.progress(30)
-                
-                results = process_audio(uploaded_file)
-                
-                status_text.info("Processing tablature...")
-                progress_bar.progress(70)
-                time.sleep(0.5)
-                
-                progress_bar.progress(100)
-                status_text.empty()
-                
-                if results and "tabs" in results and len(results["tabs"].strip()) > 0:
-                    st.success("🎉 Conversion successful! Guitar tab has been generated.")
-                    
-                    # Download buttons with improved styling
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        # MIDI Download button
-                        midi_download = get_download_link(
-                            results["midi_bytes"], 
-                            results["midi_filename"],
-                            "⬇️ Download MIDI File",
-                            "download-midi"
-                        )
-                        st.markdown(midi_download, unsafe_allow_html=True)
-                    
-                    with col2:
-                        # Tab Download button
-                        tab_download = get_download_link(
-                            results["tabs"].encode(),
-                            results["midi_filename"].replace(".mid", ".txt"),
-                            "⬇️ Download Tab as Text File",
-                            ""
-                        )
-                        st.markdown(tab_download, unsafe_allow_html=True)
-                    
-                    # Display the tab with a better heading
-                    st.subheader("Guitar Tablature")                
-                    
-                    # Create a full-width container for the tab
-                    tab_container = st.container()
-                    with tab_container:
-                        formatted_tab = format_tab_for_display(results["tabs"])
-                        # Use a monospace pre tag for better rendering with proper HTML escaping
-                        st.markdown(f"""
-                        <div class="tab-container">
-                            <pre>{html.escape(formatted_tab)}</pre>
-                            <div class="tab-instructions">
-                                <small>Scroll horizontally to see more ➡️</small>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                else:
-                    st.error("Failed to generate guitar tab. The audio may not contain distinct notes or may be too complex.")
-                    st.info("Try with a cleaner recording or a simpler melody for better results.")
-            except Exception as e:
-                st.error(f"An error occurred: {str(e)}")
-                st.info("Please try with a different audio file or ensure your MP3 is not corrupted.")
+            # Run the conversion on the shared worker pool; the page polls for its status
+            render_segment = render_tab_section if st.session_state.tab_engine == "native" else None
+            profiler = Profiler() if st.session_state.profile else None
+            with profiler.activate() if profiler is not None else contextlib.nullcontext(), span("upload_read"):
+                audio_bytes = uploaded_file.getvalue()
+            job = get_job_queue().submit(
+                process_audio, audio_bytes, uploaded_file.name,
+                get_transcriber(), get_result_cache(), get_admission_queue(), st.session_state.tab_engine,
+                profiler, name=uploaded_file.name, render_segment=render_segment,
+            )
+            st.session_state.job_id = job.id
+            # Keep the ID in the URL too, so a refreshed page finds the job again
+            st.query_params["job"] = job.id
+    
+    # Show the latest job, whether it was started in this run or before a refresh
+    job_id = st.session_state.get("job_id") or st.query_params.get("job")
+    job = get_job_queue().get(job_id) if job_id else None
+    if job is not None:
+        st.session_state.job_id = job.id
+        if job.done:
+            render_job_result(job)
+            if job.result and "profile" in job.result:
+                with debug_expander:
+                    render_profile(job.result["profile"])
+        else:
+            render_job_progress(job.id)
     
     st.divider()
     
@@ -1370,6 +481,10 @@ def main():
     </div>
     """
     st.markdown(footer_html, unsafe_allow_html=True)
+    
+    # Start loading the model once the page has rendered, without holding up this run
+    start_model_warm_up()
+    start_metrics_endpoint()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
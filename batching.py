@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+# Most windows run through the model in one call, and how long the first
+# pending window waits for others to join it
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get("TAB_GENER8OR_MAX_BATCH", "8"))
+DEFAULT_MAX_WAIT = float(os.environ.get("TAB_GENER8OR_BATCH_WAIT_MS", "10")) / 1000
+
+# Callers seen within this many seconds are expected to send another window soon
+ACTIVE_WINDOW = 0.5
+
+
+class _Request:
+    """One predict() call waiting for its share of a batch."""
+
+    def __init__(self, x):
+        self.x = x
+        self.size = x.shape[0]
+        self.output = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class BatchingModel:
+    """
+    Wrapper that runs windows from concurrent callers through the model together.
+
+    predict() calls from any number of threads are queued; a single server
+    thread gathers them into batches of up to ``max_batch_size`` windows,
+    runs one model call and hands each caller its slice of the output.
+
+    The server only waits for more windows when other callers have been
+    active recently, so a lone conversion isn't slowed down by ``max_wait``
+    on every window.
+    """
+
+    def __init__(self, model, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._pending = []
+        self._last_seen = {}
+        self._server = threading.Thread(target=self._serve, name="batching-model", daemon=True)
+        self._server.start()
+
+    def __getattr__(self, name):
+        # Expose the wrapped model's attributes, e.g. model_type
+        return getattr(self.model, name)
+
+    def predict(self, x):
+        """Same contract as Model.predict(); blocks until this call's batch has run."""
+        request = _Request(x)
+        with self._cond:
+            self._pending.append(request)
+            self._last_seen[threading.get_ident()] = time.monotonic()
+            self._cond.notify_all()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.output
+
+    def _active_callers(self, now):
+        """Number of threads that called predict() recently. Caller holds the lock."""
+        for ident, seen in list(self._last_seen.items()):
+            if now - seen > ACTIVE_WINDOW:
+                del self._last_seen[ident]
+        return len(self._last_seen)
+
+    def _next_batch(self):
+        """Block until a batch is ready and take its requests off the queue."""
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            deadline = time.monotonic() + self.max_wait
+            while True:
+                now = time.monotonic()
+                queued = sum(request.size for request in self._pending)
+                if queued >= self.max_batch_size or now >= deadline:
+                    break
+                if len(self._pending) >= self._active_callers(now):
+                    break
+                self._cond.wait(deadline - now)
+
+            batch = []
+            size = 0
+            while self._pending and (not batch or size + self._pending[0].size <= self.max_batch_size):
+                request = self._pending.pop(0)
+                batch.append(request)
+                size += request.size
+            return batch
+
+    def _run_batch(self, batch):
+        if len(batch) == 1:
+            batch[0].output = self.model.predict(batch[0].x)
+            return
+        output = self.model.predict(np.concatenate([request.x for request in batch]))
+        offset = 0
+        for request in batch:
+            request.output = {k: v[offset:offset + request.size] for k, v in output.items()}
+            offset += request.size
+
+    def _serve(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._run_batch(batch)
+            except Exception:
+                # Some runtimes only accept a fixed batch size; fall back to one call each
+                for request in batch:
+                    try:
+                        request.output = self.model.predict(request.x)
+                    except Exception as e:
+                        request.error = e
+            for request in batch:
+                request.done.set()
@@ -0,0 +1,160 @@
+"""
+Compare inference backends (TensorFlow SavedModel, TFLite, ONNX) on the same audio.
+
+Each backend is loaded in a fresh process, so runtimes don't share thread
+pools or memory. The synthetic fixture from synth.py is decoded once per
+process and the timed section is transcribe() only: model inference plus
+note extraction. Notes are compared with the first backend's, since the
+serialisations aren't bit-identical.
+
+Usage:
+    python benchmarks/bench_backends.py                          # all backends, 60s of audio
+    python benchmarks/bench_backends.py --backends tflite onnx --threads 1 2 4
+    python benchmarks/bench_backends.py --audio riff.mp3 -o backends.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from bench_pipeline import DEFAULT_FIXTURES_DIR, DEFAULT_RESULTS_DIR, fixture_path, git_commit
+from profiling import peak_rss_mb
+
+# Onsets within this many seconds of each other count as the same note
+ONSET_TOLERANCE = 0.05
+
+
+def run_backend(audio_path, backend, threads, repeat):
+    """
+    Load one backend and time transcription. Runs inside the worker process.
+
+    Returns:
+        dict: Load time, best transcription time, throughput, peak RSS and
+            the notes as (start, pitch) pairs for the agreement check
+    """
+    from transcriber import AUDIO_SAMPLE_RATE, Transcriber, decode_audio
+
+    with open(audio_path, "rb") as f:
+        audio = decode_audio(f.read(), os.path.splitext(audio_path)[1])
+    duration = len(audio) / AUDIO_SAMPLE_RATE
+
+    start = time.perf_counter()
+    transcriber = Transcriber(streaming=False, backend=backend, intra_op_threads=threads,
+                              inter_op_threads=1 if threads else 0).warm_up()
+    load = time.perf_counter() - start
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _, _, note_events = transcriber.transcribe(audio)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return {
+        "backend": backend,
+        "model_type": transcriber.model.model_type.name,
+        "threads": threads,
+        "duration_s": duration,
+        "load_s": load,
+        "transcribe_s": best,
+        "throughput": duration / best if best else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "notes": [(float(start), int(pitch)) for start, _, pitch, _, _ in note_events],
+    }
+
+
+def note_agreement(reference, notes):
+    """F1 score of ``notes`` against ``reference``, matching pitch and onset within ONSET_TOLERANCE."""
+    if not reference and not notes:
+        return 1.0
+    unmatched = sorted(reference)
+    matched = 0
+    for start, pitch in notes:
+        for i, (ref_start, ref_pitch) in enumerate(unmatched):
+            if ref_pitch == pitch and abs(ref_start - start) <= ONSET_TOLERANCE:
+                del unmatched[i]
+                matched += 1
+                break
+    return 2 * matched / (len(reference) + len(notes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inference backends on the same audio")
+    parser.add_argument("--backends", nargs="+", default=["tf", "tflite", "onnx"],
+                       choices=("auto", "tf", "tflite", "onnx"),
+                       help="Backends to compare; the first is the reference for note agreement")
+    parser.add_argument("--threads", type=int, nargs="+", default=[0],
+                       help="Intra-op thread counts to try for each backend; 0 is the runtime default")
+    parser.add_argument("--audio",
+                       help="Audio file to transcribe (default: a synthetic fixture)")
+    parser.add_argument("--duration", type=float, default=60.0,
+                       help="Length of the synthetic fixture in seconds (default: 60)")
+    parser.add_argument("--repeat", type=int, default=3,
+                       help="Transcriptions per backend after warm-up; the fastest is kept (default: 3)")
+    parser.add_argument("-o", "--output",
+                       help="JSON results file (default: benchmarks/results/backends-<timestamp>.json)")
+    parser.add_argument("--case", nargs=3, metavar=("AUDIO", "BACKEND", "THREADS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        # Worker mode: one backend, result as JSON on the last stdout line
+        print(json.dumps(run_backend(args.case[0], args.case[1], int(args.case[2]), args.repeat)))
+        return
+
+    audio_path = args.audio
+    if audio_path is None:
+        from synth import write_fixture
+
+        audio_path = fixture_path(DEFAULT_FIXTURES_DIR, args.duration, 0, ".wav")
+        if not os.path.exists(audio_path):
+            print(f"Synthesising {args.duration:g}s fixture...")
+            write_fixture(audio_path, args.duration)
+
+    results = []
+    reference = None
+    for backend in args.backends:
+        for threads in args.threads:
+            proc = subprocess.run(
+                [sys.executable, __file__, "--case", audio_path, backend, str(threads), "--repeat", str(args.repeat)],
+                capture_output=True, text=True,
+            )
+            label = f"{backend} ({threads or 'default'} threads)"
+            if proc.returncode != 0:
+                error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+                print(f"{label:<28} skipped: {error}")
+                results.append({"backend": backend, "threads": threads, "error": error})
+                continue
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            notes = result.pop("notes")
+            if reference is None:
+                reference = notes
+            result["note_agreement"] = note_agreement(reference, notes)
+            result["n_notes"] = len(notes)
+            results.append(result)
+            print(f"{label:<28} load {result['load_s']:6.2f}s  transcribe {result['transcribe_s']:7.2f}s  "
+                  f"{result['throughput']:6.1f}x realtime  RSS {result['peak_rss_mb']:5.0f} MiB  "
+                  f"notes {result['n_notes']} (agreement {result['note_agreement']:.3f})")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "audio": os.path.basename(audio_path),
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"backends-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+End-to-end conversion benchmark on synthetic plucked-string audio.
+
+For each duration a fixture is synthesised (and kept in --fixtures), then
+converted in a fresh worker process so peak RSS and warm-up are measured per
+case. Each stage is timed on its own: decode, predict (model inference and
+note extraction, split from the progress events), MIDI write, tab render and
+display formatting. Caches are disabled so every stage does its full work.
+
+Usage:
+    python benchmarks/bench_pipeline.py                       # 10s, 60s, 300s, 600s
+    python benchmarks/bench_pipeline.py --durations 10 60 -o before.json
+    python benchmarks/bench_pipeline.py --durations 10 60 -o after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+from profiling import peak_rss_mb
+
+DEFAULT_DURATIONS = (10, 60, 300, 600)
+DEFAULT_FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+STAGES = ("decode", "inference", "notes", "midi_write", "tab_render", "display_format")
+
+
+def fixture_path(fixtures_dir, duration, seed, extension):
+    return os.path.join(fixtures_dir, f"pluck_{duration:g}s_seed{seed}{extension}")
+
+
+def run_case(audio_path, duration, tab_engine, repeat):
+    """
+    Convert one fixture and time every stage. Runs inside the worker process.
+
+    Returns:
+        dict: Per-stage seconds (best of ``repeat``), throughput and peak RSS
+    """
+    from transcriber import Transcriber, decode_audio, midi_to_bytes
+    from tabs import format_tab_for_display, generate_tabs
+
+    with open(audio_path, "rb") as f:
+        audio_bytes = f.read()
+    suffix = os.path.splitext(audio_path)[1]
+
+    load_start = time.perf_counter()
+    transcriber = Transcriber(streaming=False).warm_up()
+    model_load = time.perf_counter() - load_start
+
+    best = None
+    for _ in range(repeat):
+        timings = {}
+        start = time.perf_counter()
+        audio = decode_audio(audio_bytes, suffix)
+        timings["decode"] = time.perf_counter() - start
+
+        # transcribe() reports "notes" when inference is done, which splits the two
+        marks = {}
+
+        def progress(stage, fraction):
+            if stage == "notes" and fraction == 0.0:
+                marks["notes_start"] = time.perf_counter()
+
+        start = time.perf_counter()
+        _, midi_data, note_events = transcriber.transcribe(audio, progress)
+        end = time.perf_counter()
+        timings["inference"] = marks.get("notes_start", end) - start
+        timings["notes"] = end - marks.get("notes_start", end)
+
+        start = time.perf_counter()
+        midi_bytes = midi_to_bytes(midi_data)
+        timings["midi_write"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, tabs = generate_tabs(note_events, midi_bytes, tab_engine)
+        timings["tab_render"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        format_tab_for_display(tabs)
+        timings["display_format"] = time.perf_counter() - start
+
+        if best is None or sum(timings.values()) < sum(best.values()):
+            best = timings
+
+    total = sum(best.values())
+    return {
+        "duration_s": duration,
+        "audio_file": os.path.basename(audio_path),
+        "tab_engine": tab_engine,
+        "n_notes": len(note_events),
+        "model_load_s": model_load,
+        "stages_s": best,
+        "total_s": total,
+        "throughput": duration / total if total else None,
+        "stage_throughput": {stage: duration / t if t else None for stage, t in best.items()},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_case(case):
+    stages = "  ".join(f"{stage} {case['stages_s'][stage]:.3f}s" for stage in STAGES)
+    print(f"{case['duration_s']:>6g}s audio: {case['total_s']:.2f}s total, "
+          f"{case['throughput']:.1f}x realtime, peak RSS {case['peak_rss_mb']:.0f} MiB")
+    print(f"         {stages}")
+
+
+def print_comparison(cases, baseline_path):
+    """Print each case's total and per-stage time relative to a previous run."""
+    with open(baseline_path) as f:
+        baseline = {case["duration_s"]: case for case in json.load(f)["cases"]}
+    print(f"\nCompared with {baseline_path} (ratio < 1 is faster):")
+    for case in cases:
+        before = baseline.get(case["duration_s"])
+        if before is None:
+            continue
+        ratios = "  ".join(
+            f"{stage} {case['stages_s'][stage] / before['stages_s'][stage]:.2f}"
+            for stage in STAGES if before["stages_s"].get(stage)
+        )
+        print(f"{case['duration_s']:>6g}s: total {case['total_s'] / before['total_s']:.2f}  "
+              f"RSS {case['peak_rss_mb'] / before['peak_rss_mb']:.2f}  {ratios}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the conversion pipeline on synthetic audio")
+    parser.add_argument("--durations", type=float, nargs="+", default=list(DEFAULT_DURATIONS),
+                       help="Audio lengths in seconds (default: 10 60 300 600)")
+    parser.add_argument("--format", default=".wav", choices=(".wav", ".flac", ".ogg", ".mp3"),
+                       help="Fixture container (default: .wav)")
+    parser.add_argument("--sample-rate", type=int, default=44100,
+                       help="Fixture sample rate; 44100 exercises resampling (default: 44100)")
+    parser.add_argument("--seed", type=int, default=0,
+                       help="Synthesis seed (default: 0)")
+    parser.add_argument("--tab-engine", default="native",
+                       help="Tab engine to time (default: native)")
+    parser.add_argument("--repeat", type=int, default=1,
+                       help="Conversions per case after warm-up; the fastest is kept (default: 1)")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR,
+                       help="Directory for generated audio (default: benchmarks/fixtures)")
+    parser.add_argument("-o", "--output",
+                       help="JSON results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare",
+                       help="Previous results file to compare against")
+    parser.add_argument("--case", nargs=2, metavar=("AUDIO", "DURATION"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        # Worker mode: one conversion, result as JSON on the last stdout line
+        result = run_case(args.case[0], float(args.case[1]), args.tab_engine, args.repeat)
+        print(json.dumps(result))
+        return
+
+    from synth import write_fixture
+
+    cases = []
+    for duration in args.durations:
+        path = fixture_path(args.fixtures, duration, args.seed, args.format)
+        if not os.path.exists(path):
+            print(f"Synthesising {duration:g}s fixture...")
+            write_fixture(path, duration, args.seed, args.sample_rate)
+        proc = subprocess.run(
+            [sys.executable, __file__, "--case", path, str(duration),
+             "--tab-engine", args.tab_engine, "--repeat", str(args.repeat)],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"{duration:g}s case failed:\n{proc.stderr}")
+            sys.exit(1)
+        case = json.loads(proc.stdout.strip().splitlines()[-1])
+        cases.append(case)
+        print_case(case)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "fixture_format": args.format,
+            "fixture_sample_rate": args.sample_rate,
+            "seed": args.seed,
+        },
+        "cases": cases,
+    }
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        print_comparison(cases, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Measure how long the entry-point modules take to import.
+
+Each module is imported in a fresh interpreter, so nothing is shared between
+measurements. The check fails if a module pulls in one of the heavy ML
+libraries at import time, or if it takes longer than the budget. app.py is
+measured on top of Streamlit's own import cost, which we don't control.
+
+Usage:
+    python benchmarks/import_time.py [--budget SECONDS] [--repeat N] [--strict]
+
+Exits with status 1 when a check fails, so CI can run it as is. Modules
+whose dependencies aren't installed are skipped unless --strict is given.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that must only be imported once a conversion actually needs them
+HEAVY_MODULES = (
+    "tensorflow", "tflite_runtime", "onnxruntime", "coremltools",
+    "basic_pitch", "librosa", "music21", "tayuya",
+)
+
+ENTRY_MODULES = ("main", "server", "pipeline", "transcriber", "tabs", "app")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure(module, repeat=3):
+    """
+    Import ``module`` in fresh interpreters and keep the fastest run.
+
+    Returns:
+        dict: "seconds" and the heavy modules that ended up in sys.modules,
+            or "error" if the import failed
+    """
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=REPO_ROOT, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed"}
+        # Streamlit prints warnings when imported outside `streamlit run`; the result is the last line
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that entry points import quickly and lazily")
+    parser.add_argument("--budget", type=float, default=1.0,
+                       help="Maximum import time per module in seconds (default: 1.0)")
+    parser.add_argument("--repeat", type=int, default=3,
+                       help="Imports per module; the fastest is kept (default: 3)")
+    parser.add_argument("--strict", action="store_true",
+                       help="Fail on modules that can't be imported instead of skipping them")
+    parser.add_argument("--json", action="store_true",
+                       help="Print the measurements as JSON")
+    args = parser.parse_args()
+
+    results = {module: measure(module, args.repeat) for module in ENTRY_MODULES}
+    streamlit = measure("streamlit", args.repeat)
+
+    failures = []
+    for module, result in results.items():
+        if "error" in result:
+            # Missing optional dependencies (e.g. Streamlit on a CLI-only box) aren't our import cost
+            if args.strict:
+                failures.append(f"{module} failed to import: {result['error']}")
+            continue
+        own = result["seconds"]
+        if module == "app" and "seconds" in streamlit:
+            own = max(0.0, own - streamlit["seconds"])
+        result["own_seconds"] = own
+        if result["heavy"]:
+            failures.append(f"{module} imports {', '.join(result['heavy'])} eagerly")
+        if own > args.budget:
+            failures.append(f"{module} takes {own:.2f}s to import (budget {args.budget:.2f}s)")
+
+    if args.json:
+        print(json.dumps({"modules": results, "streamlit": streamlit, "failures": failures}, indent=2))
+    else:
+        for module, result in results.items():
+            if "error" in result:
+                print(f"{module:<12} skipped ({result['error']})")
+            else:
+                heavy = f"  eager: {', '.join(result['heavy'])}" if result["heavy"] else ""
+                print(f"{module:<12} {result['own_seconds'] * 1000:8.1f} ms{heavy}")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
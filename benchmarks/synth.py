@@ -0,0 +1,155 @@
+"""
+Deterministic guitar-like test audio from Karplus-Strong plucked-string synthesis.
+
+The same seed and duration always give the same samples and the same note
+list, so benchmark runs on different machines or commits convert identical
+input. The notes are written next to the audio as JSON for reference.
+
+Usage:
+    python benchmarks/synth.py --duration 60 -o fixtures/pluck_60s.wav
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+SAMPLE_RATE = 44100
+
+# Guitar range in standard tuning: low E (40) to the 17th fret on the high e (81)
+LOWEST_PITCH = 40
+HIGHEST_PITCH = 81
+
+# Per-period loss of the string; closer to 1 rings longer
+DECAY = 0.996
+
+# Where along the string it is plucked, as a fraction of its length
+PLUCK_POSITION = 0.2
+
+
+def midi_to_hz(pitch):
+    return 440.0 * 2 ** ((pitch - 69) / 12)
+
+
+def pluck(pitch, duration, rng, sample_rate=SAMPLE_RATE, decay=DECAY):
+    """
+    Synthesise one plucked note with the Karplus-Strong algorithm.
+
+    The recurrence y[n] = decay * (y[n-N] + y[n-N-1]) / 2 only looks one
+    period back, so it is evaluated a whole period at a time with NumPy.
+
+    Args:
+        pitch (int): MIDI pitch
+        duration (float): Length in seconds, including the decay
+        rng (np.random.Generator): Source of the noise in the initial pluck
+
+    Returns:
+        np.ndarray: float32 samples
+    """
+    period = max(2, int(round(sample_rate / midi_to_hz(pitch))))
+    n_samples = int(duration * sample_rate)
+    n_periods = -(-n_samples // period)
+
+    out = np.empty(n_periods * period, dtype=np.float32)
+    # A string plucked a fifth of the way along starts as a triangle, which
+    # keeps the fundamental strongest; a little noise adds the attack
+    position = np.arange(period) / period
+    block = np.minimum(position / PLUCK_POSITION, (1 - position) / (1 - PLUCK_POSITION))
+    block = (block + 0.1 * rng.uniform(-1.0, 1.0, period)).astype(np.float32)
+    block -= block.mean()
+    previous_last = 0.0
+    for i in range(n_periods):
+        out[i * period:(i + 1) * period] = block
+        shifted = np.empty_like(block)
+        shifted[0] = previous_last
+        shifted[1:] = block[:-1]
+        previous_last = block[-1]
+        block = decay * 0.5 * (block + shifted)
+    return out[:n_samples]
+
+
+def make_score(duration, seed=0):
+    """
+    Generate a reproducible sequence of single notes and two-note chords.
+
+    Returns:
+        list: (start_s, end_s, pitch) tuples sorted by start time
+    """
+    rng = np.random.default_rng(seed)
+    notes = []
+    time = 0.25
+    pitch = 52
+    while time < duration - 0.5:
+        length = float(rng.choice([0.25, 0.5, 0.75, 1.0]))
+        # Mostly stepwise motion, like a melody, with occasional leaps
+        pitch = int(np.clip(pitch + rng.integers(-4, 5), LOWEST_PITCH, HIGHEST_PITCH - 7))
+        end = min(time + length, duration)
+        notes.append((time, end, pitch))
+        if rng.random() < 0.2:
+            notes.append((time, end, pitch + int(rng.choice([3, 4, 7]))))
+        time += length
+    return notes
+
+
+def render_score(notes, duration, seed=0, sample_rate=SAMPLE_RATE):
+    """
+    Mix the plucked notes of a score into one mono signal.
+
+    Each note rings for a little longer than its notated length, like a
+    string that isn't damped straight away.
+
+    Returns:
+        np.ndarray: float32 samples peaking at -1 dBFS
+    """
+    rng = np.random.default_rng(seed + 1)
+    audio = np.zeros(int(duration * sample_rate), dtype=np.float32)
+    for start, end, pitch in notes:
+        tone = pluck(pitch, end - start + 0.3, rng, sample_rate)
+        begin = int(start * sample_rate)
+        tone = tone[:len(audio) - begin]
+        audio[begin:begin + len(tone)] += 0.5 * tone
+    peak = np.abs(audio).max()
+    if peak > 0:
+        audio *= 10 ** (-1 / 20) / peak
+    return audio
+
+
+def write_fixture(path, duration, seed=0, sample_rate=SAMPLE_RATE):
+    """
+    Write synthetic audio and its score (``<path>.notes.json``).
+
+    The container is picked from the extension by libsndfile (WAV, FLAC, OGG,
+    and MP3 with libsndfile 1.1+).
+
+    Returns:
+        list: The score written alongside the audio
+    """
+    import soundfile
+
+    notes = make_score(duration, seed)
+    audio = render_score(notes, duration, seed, sample_rate)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    soundfile.write(path, audio, sample_rate)
+    with open(f"{path}.notes.json", "w") as f:
+        json.dump([{"start": s, "end": e, "pitch": p} for s, e, p in notes], f)
+    return notes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate deterministic plucked-string test audio")
+    parser.add_argument("-o", "--output", required=True,
+                       help="Audio file to write; the extension picks the format")
+    parser.add_argument("--duration", type=float, default=30.0,
+                       help="Length in seconds (default: 30)")
+    parser.add_argument("--seed", type=int, default=0,
+                       help="Random seed for the score and the pluck noise (default: 0)")
+    parser.add_argument("--sample-rate", type=int, default=SAMPLE_RATE,
+                       help=f"Output sample rate (default: {SAMPLE_RATE})")
+    args = parser.parse_args()
+
+    notes = write_fixture(args.output, args.duration, args.seed, args.sample_rate)
+    print(f"Wrote {args.duration:.0f}s with {len(notes)} notes to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
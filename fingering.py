@@ -0,0 +1,207 @@
+import math
+from itertools import product
+
+import numpy as np
+
+# Strings are numbered from 1 (high e) to 6 (low E), as in printed tab
+STANDARD_TUNING = (64, 59, 55, 50, 45, 40)  # open-string MIDI pitches
+MAX_FRET = 22
+
+# Onsets closer than this are treated as one chord
+CHORD_TOLERANCE = 0.03
+
+# Search limits: fingerings kept per chord, and combinations tried per chord
+MAX_STATES = 24
+MAX_COMBINATIONS = 4096
+
+# Cost weights for the dynamic program
+MOVE_WEIGHT = 1.0       # per fret the hand shifts between chords
+STRING_WEIGHT = 0.3     # per string the hand crosses between chords
+STRETCH_WEIGHT = 1.0    # per fret (squared) a chord spans beyond COMFORTABLE_SPAN
+COMFORTABLE_SPAN = 3
+HEIGHT_WEIGHT = 0.05    # per fret up the neck, favours lower positions
+
+# Matrices are built for this many transitions at a time to bound memory
+BLOCK_SIZE = 512
+
+
+def fret_candidates(pitch, tuning=STANDARD_TUNING, max_fret=MAX_FRET):
+    """
+    List every (string, fret) position that plays a MIDI pitch.
+
+    Pitches outside the guitar's range are shifted by octaves until they fit,
+    so every note gets at least one position.
+
+    Returns:
+        list: (string, fret) tuples, string numbered from 1 (high e)
+    """
+    lowest, highest = min(tuning), max(tuning) + max_fret
+    while pitch < lowest:
+        pitch += 12
+    while pitch > highest:
+        pitch -= 12
+    return [
+        (string, pitch - open_pitch)
+        for string, open_pitch in enumerate(tuning, start=1)
+        if 0 <= pitch - open_pitch <= max_fret
+    ]
+
+
+def group_chords(note_events, tolerance=CHORD_TOLERANCE):
+    """
+    Sort note events by onset and group those starting together.
+
+    Args:
+        note_events (list): (start_s, end_s, pitch, amplitude, pitch_bends) tuples from Basic Pitch
+        tolerance (float): Maximum onset difference, in seconds, within one chord
+
+    Returns:
+        list: Lists of note events, one per onset, highest pitch first
+    """
+    chords = []
+    for event in sorted(note_events, key=lambda e: (e[0], -e[2])):
+        if chords and event[0] - chords[-1][0][0] <= tolerance:
+            chords[-1].append(event)
+        else:
+            chords.append([event])
+    for chord in chords:
+        chord.sort(key=lambda e: -e[2])
+    return chords
+
+
+def chord_fingerings(pitches, tuning=STANDARD_TUNING, max_fret=MAX_FRET):
+    """
+    Enumerate playable fingerings of the notes in one chord.
+
+    Notes that can't all be fitted on separate strings are dropped from the
+    bottom of the chord until a fingering exists.
+
+    Args:
+        pitches (list): MIDI pitches, highest first
+
+    Returns:
+        tuple: (number of notes kept, list of fingerings); each fingering is
+            a tuple of (string, fret) pairs aligned with the kept pitches
+    """
+    pitches = list(pitches[:len(tuning)])
+    while pitches:
+        candidates = [fret_candidates(int(p), tuning, max_fret) for p in pitches]
+        # Trim the highest positions of each note until the search stays small
+        keep = max(len(c) for c in candidates)
+        while keep > 1 and math.prod(min(len(c), keep) for c in candidates) > MAX_COMBINATIONS:
+            keep -= 1
+        candidates = [sorted(c, key=lambda sf: sf[1])[:keep] for c in candidates]
+
+        fingerings = [
+            combo for combo in product(*candidates)
+            if len({string for string, _ in combo}) == len(combo)
+        ]
+        if fingerings:
+            return len(pitches), fingerings
+        pitches.pop()
+    return 0, []
+
+
+def fingering_features(fingering):
+    """
+    Summarise a fingering for the cost model.
+
+    Returns:
+        tuple: (hand position, mean string, static cost); hand position is -1
+            when only open strings are played, so the hand is free to move
+    """
+    frets = [fret for _, fret in fingering if fret > 0]
+    strings = [string for string, _ in fingering]
+    if frets:
+        span = max(frets) - min(frets)
+        hand = min(frets)
+        stretch = max(0, span - COMFORTABLE_SPAN)
+        static = STRETCH_WEIGHT * stretch ** 2 + HEIGHT_WEIGHT * sum(frets) / len(frets)
+    else:
+        hand = -1
+        static = 0.0
+    return hand, sum(strings) / len(strings), static
+
+
+def transition_costs(hands_from, strings_from, hands_to, strings_to):
+    """
+    Cost of moving between every pair of fingerings, for a block of steps.
+
+    Args:
+        hands_from, strings_from (np.ndarray): (n_steps, n_states) features before each step
+        hands_to, strings_to (np.ndarray): (n_steps, n_states) features after each step
+
+    Returns:
+        np.ndarray: (n_steps, n_states, n_states) cost matrices
+    """
+    shift = np.abs(hands_from[:, :, None] - hands_to[:, None, :])
+    # Open-string fingerings don't pin the hand, so they cost nothing to move from or to
+    free = (hands_from[:, :, None] < 0) | (hands_to[:, None, :] < 0)
+    shift[free] = 0.0
+    crossing = np.abs(strings_from[:, :, None] - strings_to[:, None, :])
+    return MOVE_WEIGHT * shift + STRING_WEIGHT * crossing
+
+
+def optimise_fingering(chord_pitches, tuning=STANDARD_TUNING, max_fret=MAX_FRET):
+    """
+    Choose a fingering for every chord by minimising hand movement and stretch.
+
+    Runs a Viterbi-style dynamic program over the chord sequence. Each chord
+    has up to MAX_STATES candidate fingerings; the transition costs between
+    consecutive chords are computed as batched NumPy matrices, so only the
+    min/argmin recursion runs per step.
+
+    Args:
+        chord_pitches (list): For each chord, its MIDI pitches, highest first
+        tuning (tuple): Open-string MIDI pitches, high string first
+        max_fret (int): Highest usable fret
+
+    Returns:
+        list: For each chord, a tuple of (string, fret) pairs for the notes
+            that could be placed (extra notes at the bottom are dropped)
+    """
+    n_steps = len(chord_pitches)
+    if n_steps == 0:
+        return []
+
+    # Candidate fingerings per chord, padded to a fixed number of states
+    states = []
+    hands = np.full((n_steps, MAX_STATES), -1.0, dtype=np.float32)
+    strings = np.zeros((n_steps, MAX_STATES), dtype=np.float32)
+    static = np.full((n_steps, MAX_STATES), np.inf, dtype=np.float32)
+    for step, pitches in enumerate(chord_pitches):
+        _, fingerings = chord_fingerings(pitches, tuning, max_fret)
+        features = [fingering_features(f) for f in fingerings]
+        # Keep the cheapest fingerings when a chord has too many
+        order = sorted(range(len(fingerings)), key=lambda i: features[i][2])[:MAX_STATES]
+        states.append([fingerings[i] for i in order])
+        for slot, i in enumerate(order):
+            hands[step, slot], strings[step, slot], static[step, slot] = features[i]
+        if not order:
+            # Nothing playable; a single empty state keeps the chain connected
+            states[-1] = [()]
+            static[step, 0] = 0.0
+
+    # Viterbi forward pass
+    cost = static[0].copy()
+    backpointers = np.zeros((n_steps, MAX_STATES), dtype=np.int16)
+    columns = np.arange(MAX_STATES)
+    for block_start in range(0, n_steps - 1, BLOCK_SIZE):
+        block_end = min(block_start + BLOCK_SIZE, n_steps - 1)
+        moves = transition_costs(
+            hands[block_start:block_end], strings[block_start:block_end],
+            hands[block_start + 1:block_end + 1], strings[block_start + 1:block_end + 1],
+        )
+        for offset, move in enumerate(moves):
+            step = block_start + offset + 1
+            total = cost[:, None] + move
+            best = np.argmin(total, axis=0)
+            backpointers[step] = best
+            cost = total[best, columns] + static[step]
+
+    # Backtrack the cheapest path
+    path = np.empty(n_steps, dtype=np.int64)
+    path[-1] = int(np.argmin(cost))
+    for step in range(n_steps - 1, 0, -1):
+        path[step - 1] = backpointers[step, path[step]]
+    return [states[step][path[step]] for step in range(n_steps)]
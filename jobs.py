@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import REGISTRY
+
+# Conversions run in at most this many threads per process. They share the
+# warm model, and inference itself is further limited by the admission queue,
+# so the extra workers mostly cover decoding, cache lookups and tab rendering
+DEFAULT_WORKERS = int(os.environ.get("TAB_GENER8OR_WORKERS", "4"))
+
+# Finished jobs are kept this long so a refreshed page can still pick them up
+JOB_TTL_SECONDS = 3600
+
+JOBS_ACTIVE = REGISTRY.gauge("jobs", "Background conversion jobs waiting for or holding a worker.", ("status",))
+JOBS_FINISHED = REGISTRY.counter("jobs_finished_total", "Background conversion jobs by final status.", ("status",))
+
+
+class Job:
+    """
+    State of one background conversion, updated by the worker thread.
+
+    The page only reads these attributes, so plain assignments are enough;
+    ``segments`` is append-only.
+    """
+
+    def __init__(self, name="", render_segment=None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.status = "queued"
+        self.stage = None
+        self.fraction = 0.0
+        self.queue_position = 0
+        self.segments = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._render_segment = render_segment
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    def report(self, stage, fraction):
+        """progress(stage, fraction) callback for the pipeline."""
+        self.stage = stage
+        self.fraction = fraction
+
+    def set_queue_position(self, position):
+        """on_wait() callback for the admission queue; 0 once inference has started."""
+        self.queue_position = position
+
+    def add_segment(self, start_s, end_s, note_events):
+        """on_segment() callback; stores the rendered preview of a finished segment."""
+        if self._render_segment is not None:
+            self.segments.append((start_s, end_s, self._render_segment(note_events, start_s)))
+
+
+class JobQueue:
+    """
+    Process-wide pool of conversion workers with jobs looked up by ID.
+
+    Jobs outlive the Streamlit script run that submitted them, so widget
+    interactions and page refreshes don't abandon work in progress.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, ttl=JOB_TTL_SECONDS):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="convert")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, name="", render_segment=None, **kwargs):
+        """
+        Queue ``func(*args, progress=..., on_segment=..., on_wait=..., **kwargs)``.
+
+        Args:
+            func (callable): Conversion function accepting progress, on_segment
+                and on_wait callbacks
+            name (str): Label shown while the job runs
+            render_segment (callable, optional): render_segment(note_events, start_s)
+                turning a finished segment into preview text
+
+        Returns:
+            Job: The queued job
+        """
+        job = Job(name, render_segment)
+        JOBS_ACTIVE.labels("queued").inc()
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        """Return the job with this ID, or None if it's unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, func, args, kwargs):
+        job.status = "running"
+        JOBS_ACTIVE.labels("queued").dec()
+        JOBS_ACTIVE.labels("running").inc()
+        try:
+            job.result = func(*args, progress=job.report, on_segment=job.add_segment,
+                              on_wait=job.set_queue_position, **kwargs)
+            job.status = "done"
+        except Exception as e:
+            # Some exceptions (e.g. audioread's NoBackendError) have no message
+            job.error = str(e) or type(e).__name__
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+            JOBS_ACTIVE.labels("running").dec()
+            JOBS_FINISHED.labels(job.status).inc()
+
+    def _prune(self):
+        """Forget finished jobs older than the TTL. Caller holds the lock."""
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished is not None and job.finished < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
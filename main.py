@@ -1,35 +1,107 @@
-from basic_pitch.inference import predict
-from tayuya import MIDIParser
+from transcriber import (AUDIO_EXTENSIONS, BACKENDS, DEFAULT_BACKEND, DEFAULT_INTER_OP_THREADS,
+                         DEFAULT_INTRA_OP_THREADS, Transcriber)
+from tabs import DISPLAY_WIDTH, TAB_ENGINES, iter_formatted_tab
+from result_cache import PCMCache, ResultCache
+from profiling import PROFILE_HOOKS, Profiler, profile_hook, span
+from pipeline import convert_audio
 import os
 import sys
-from io import StringIO
+import json
 import contextlib
 import argparse
+import glob
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import Counter
 from pathlib import Path
 
-# Helper function to capture stdout
-@contextlib.contextmanager
-def capture_stdout():
-    stdout = sys.stdout
-    string_io = StringIO()
-    sys.stdout = string_io
-    yield string_io
-    sys.stdout = stdout
+# Per-process state for batch workers, set up once by init_worker()
+_worker_transcriber = None
+_worker_cache = None
 
-def process_audio_file(mp3_path):
+def print_progress(stage, fraction):
+    """Show inference progress on a single console line."""
+    if stage == "inference":
+        print(f"\rRunning basic-pitch inference... {fraction:.0%}", end="\n" if fraction >= 1 else "", flush=True)
+
+def write_tabs(tabs, tab_path, show_tabs=True, width=DISPLAY_WIDTH):
+    """
+    Print and save tablature, reflowed to ``width`` columns.
+    
+    The formatter is consumed chunk by chunk so long tabs are streamed to the
+    console and the file without building the formatted text in memory.
+    """
+    if show_tabs:
+        print("\n--- Guitar Tab ---")
+    with open(tab_path, "w") as f, span("display_format"):
+        for chunk in iter_formatted_tab(tabs, width):
+            f.write(chunk)
+            if show_tabs:
+                print(chunk, end="")
+    if show_tabs:
+        print("------------------\n")
+    print(f"Tab saved to {tab_path}")
+
+def save_result(results, midi_path, tab_path, show_tabs=True, width=DISPLAY_WIDTH):
+    """
+    Write a conversion result to the output files.
+    
+    Args:
+        results (dict): Result from convert_audio()
+        midi_path (str): Where to write the MIDI file
+        tab_path (str): Where to write the tab text
+        show_tabs (bool): Print the tab to the console
+        width (int): Maximum tab line width in the output
+        
+    Returns:
+        dict: Results containing MIDI and tab data, or None if the tab was empty
+    """
+    midi_bytes = results["midi_bytes"]
+    with open(midi_path, "wb") as f:
+        f.write(midi_bytes)
+    print(f"MIDI file successfully created at: {midi_path}")
+    print(f"MIDI file size: {len(midi_bytes)} bytes")
+    
+    tabs = results["tabs"]
+    if not tabs or len(tabs.strip()) == 0:
+        print("\nWARNING: No tabs were generated (empty output)")
+        print("The MIDI file was successfully created and can be opened in any MIDI software.")
+        return None
+    
+    write_tabs(tabs, tab_path, show_tabs, width)
+    
+    return {
+        "tabs": tabs,
+        "midi_path": midi_path,
+        "tab_path": tab_path
+    }
+
+def process_audio_file(mp3_path, transcriber, cache=None, output_dir=".", show_tabs=True,
+                       tab_engine="native", width=DISPLAY_WIDTH, progress=None, output_name=None):
     """
     Process an audio file to generate MIDI and tablature.
     
     Args:
-        mp3_path (str): Path to the MP3 file
+        mp3_path (str): Path to the audio file (any of AUDIO_EXTENSIONS)
+        transcriber (Transcriber): Loaded model shared across conversions
+        cache (ResultCache, optional): Conversion cache to read from and fill
+        output_dir (str): Directory for the generated .mid and .txt files
+        show_tabs (bool): Print the generated tab to the console
+        tab_engine (str): Tab engine to use, one of TAB_ENGINES
+        width (int): Maximum tab line width in the saved file
+        progress (callable, optional): progress(stage, fraction) callback
+        output_name (str, optional): Output path relative to output_dir, without
+            suffix, as chosen by output_names(); defaults to the input's stem
         
     Returns:
         dict: Results containing MIDI and tab data
     """
     # Create output filenames based on input filename
-    base_name = Path(mp3_path).stem
-    midi_path = f"{base_name}_processed.mid"
-    tab_path = f"{base_name}_tab.txt"
+    base_name = output_name or Path(mp3_path).stem
+    midi_path = os.path.join(output_dir, f"{base_name}_processed.mid")
+    tab_path = os.path.join(output_dir, f"{base_name}_tab.txt")
+    os.makedirs(os.path.dirname(midi_path) or ".", exist_ok=True)
     
     print(f"Processing {mp3_path}...")
     # Check if input file exists
@@ -37,65 +109,150 @@ def process_audio_file(mp3_path):
         print(f"ERROR: Input file does not exist: {mp3_path}")
         return None
 
+    # Read the input once; the same bytes feed the cache key and the decoder
+    with open(mp3_path, "rb") as f, span("upload_read"):
+        audio_bytes = f.read()
+
     try:
-        # 1. mp3 ➜ midi (in-memory)
-        print("Running basic-pitch inference...")
-        model_out, midi_data, note_events = predict(mp3_path)
+        # Same pipeline as the app and the server: cache lookup, inference, MIDI and tab
+        if progress is None:
+            print(f"Converting with the {tab_engine} tab engine...")
+        results = convert_audio(audio_bytes, transcriber, cache, tab_engine=tab_engine,
+                                suffix=Path(mp3_path).suffix, progress=progress)
+        return save_result(results, midi_path, tab_path, show_tabs, width)
+    except Exception as e:
+        print(f"An error occurred: {str(e) or type(e).__name__}")
+        return None
 
-        print(f"Saving MIDI data to {midi_path}...")
-        midi_data.write(midi_path)        # save to disk for step-2
+def collect_input_files(inputs):
+    """
+    Expand command line inputs into a list of audio files.
+    
+    Args:
+        inputs (list): File paths, glob patterns or directories
         
-        # Verify MIDI file was created
-        if os.path.exists(midi_path):
-            print(f"MIDI file successfully created at: {midi_path}")
-            print(f"MIDI file size: {os.path.getsize(midi_path)} bytes")
+    Returns:
+        list: Audio file paths in a stable order, without duplicates
+    """
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            # Directories are searched recursively for supported audio files
+            matches = sorted(
+                str(p) for p in Path(item).rglob("*")
+                if p.is_file() and p.suffix.lower() in AUDIO_EXTENSIONS
+            )
+        elif glob.has_magic(item):
+            matches = sorted(glob.glob(item, recursive=True))
         else:
-            print(f"ERROR: MIDI file was not created at: {midi_path}")
-            return None
+            # Plain paths are passed through so missing files get reported
+            matches = [item]
+        files.extend(matches)
+    return list(dict.fromkeys(files))
 
-        # 2. midi ➜ tab (focusing on track 1 which contains the note data)
-        print(f"Parsing MIDI file {midi_path}...")
-        try:
-            print("Rendering tabs from track 1...")
-            mid = MIDIParser(midi_path, track=1)  # Track 1 has the notes
-            
-            # Since render_tabs() returns None but prints to stdout, we'll capture the output
-            with capture_stdout() as captured:
-                mid.render_tabs()
-                tabs = captured.getvalue()
-            
-            # Check if we captured any tabs
-            if tabs and len(tabs.strip()) > 0:
-                print("\n--- Guitar Tab ---")
-                print(tabs)
-                print("------------------\n")
-                
-                # Save to file
-                with open(tab_path, "w") as f:
-                    f.write(tabs)
-                print(f"Tab saved to {tab_path}")
-                
-                return {
-                    "tabs": tabs,
-                    "midi_path": midi_path,
-                    "tab_path": tab_path
-                }
-            else:
-                print("\nWARNING: No tabs were generated (empty output)")
-                print("The MIDI file was successfully created and can be opened in any MIDI software.")
-                return None
-            
-        except Exception as e:
-            print(f"Failed to render tabs: {e}")
-            return None
+def output_names(mp3_files):
+    """
+    Choose an output name for every input so no two conversions write the same files.
+    
+    Files are named after their stem, as for a single conversion. Files whose
+    stems clash (e.g. a/song.mp3 and b/song.mp3 from a recursive scan) keep
+    their path relative to the clashing files' common directory instead, so
+    they land in matching subdirectories of the output directory; if that
+    still clashes (song.mp3 and song.wav) the extension is kept in the name.
+    
+    Args:
+        mp3_files (list): Audio file paths, without duplicates
         
-    except FileNotFoundError:
-        print(f"Error: Input file '{mp3_path}' not found.")
-        print("Please make sure the MP3 file exists in the same directory as the script.")
-        return None
+    Returns:
+        dict: Output path relative to the output directory, without suffix, for each file
+    """
+    by_stem = {}
+    for path in mp3_files:
+        by_stem.setdefault(Path(path).stem, []).append(path)
+    names = {}
+    for stem, paths in by_stem.items():
+        if len(paths) == 1:
+            names[paths[0]] = stem
+            continue
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+        relative = {path: str(Path(os.path.relpath(os.path.abspath(path), root)).with_suffix(""))
+                    for path in paths}
+        counts = Counter(relative.values())
+        for path, name in relative.items():
+            names[path] = name if counts[name] == 1 else f"{name}_{Path(path).suffix.lstrip('.').lower()}"
+    return names
+
+def init_worker(use_cache, streaming=True, model_options=None):
+    """Load the model once in each batch worker process."""
+    global _worker_transcriber, _worker_cache
+    _worker_transcriber = Transcriber(streaming=streaming, pcm_cache=PCMCache() if use_cache else None,
+                                      **(model_options or {})).warm_up()
+    _worker_cache = ResultCache() if use_cache else None
+
+def convert_in_worker(mp3_path, output_dir, tab_engine, width, output_name=None):
+    """
+    Convert one file inside a batch worker.
+    
+    Returns:
+        tuple: (mp3_path, succeeded, elapsed seconds, error message or None)
+    """
+    start = time.perf_counter()
+    try:
+        results = process_audio_file(mp3_path, _worker_transcriber, _worker_cache,
+                                     output_dir=output_dir, show_tabs=False, tab_engine=tab_engine,
+                                     width=width, output_name=output_name)
+        error = None if results else "processing failed"
     except Exception as e:
-        print(f"An error occurred: {e}")
-        return None
+        results = None
+        error = str(e)
+    return mp3_path, results is not None, time.perf_counter() - start, error
+
+def print_batch_summary(outcomes, wall_time):
+    """Print per-file timing and failures for a batch run."""
+    print("\n--- Batch Summary ---")
+    for mp3_path, ok, elapsed, error in outcomes:
+        status = "OK" if ok else f"FAILED ({error})"
+        print(f"{elapsed:8.2f}s  {status:<10}  {mp3_path}")
+    failures = sum(1 for _, ok, _, _ in outcomes if not ok)
+    print(f"\n{len(outcomes) - failures}/{len(outcomes)} files converted in {wall_time:.2f}s")
+    if failures:
+        print(f"{failures} file(s) failed")
+    print("---------------------\n")
+
+def run_batch(mp3_files, output_dir, jobs, use_cache, tab_engine="native", width=DISPLAY_WIDTH,
+              streaming=True, model_options=None):
+    """
+    Convert many files in parallel, each worker holding its own warm model.
+    
+    Args:
+        mp3_files (list): Audio files to convert
+        output_dir (str): Directory for all generated files
+        jobs (int): Number of worker processes
+        use_cache (bool): Reuse cached conversions
+        tab_engine (str): Tab engine to use, one of TAB_ENGINES
+        width (int): Maximum tab line width in the saved files
+        streaming (bool): Decode and transcribe in bounded-memory segments
+        model_options (dict, optional): backend and thread counts for each worker's Transcriber
+        
+    Returns:
+        list: (mp3_path, succeeded, elapsed seconds, error) for every file
+    """
+    outcomes = []
+    # Spawn rather than fork so every worker starts with a clean TensorFlow runtime
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context,
+                             initializer=init_worker, initargs=(use_cache, streaming, model_options)) as pool:
+        names = output_names(mp3_files)
+        futures = [pool.submit(convert_in_worker, path, output_dir, tab_engine, width, names[path])
+                   for path in mp3_files]
+        for future in as_completed(futures):
+            outcome = future.result()
+            outcomes.append(outcome)
+            mp3_path, ok, elapsed, _ = outcome
+            print(f"[{len(outcomes)}/{len(mp3_files)}] {'done' if ok else 'failed'} in {elapsed:.2f}s: {mp3_path}")
+    # Report in input order rather than completion order
+    order = {path: i for i, path in enumerate(mp3_files)}
+    return sorted(outcomes, key=lambda outcome: order[outcome[0]])
 
 def main():
     """
@@ -103,15 +260,107 @@ def main():
     Handles argument parsing and processing.
     """
     # Set up command line argument parsing
-    parser = argparse.ArgumentParser(description="Convert MP3 guitar recordings to tablature")
-    parser.add_argument("mp3_file", nargs="?", default="trade-war-surfin.mp3",
-                       help="MP3 file to process (default: trade-war-surfin.mp3)")
+    parser = argparse.ArgumentParser(description="Convert guitar recordings (MP3, WAV, FLAC, OGG, M4A) to tablature")
+    parser.add_argument("inputs", nargs="+",
+                       help="Audio files, glob patterns or directories to process")
+    parser.add_argument("-o", "--output-dir", default=".",
+                       help="Directory for the generated .mid and .txt files (default: current directory)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                       help="Number of worker processes for batch runs (default: number of CPUs)")
+    parser.add_argument("--tab-engine", choices=TAB_ENGINES, default="native",
+                       help="Tab engine: native note-event engine or legacy Tayuya (default: native)")
+    parser.add_argument("--width", type=int, default=DISPLAY_WIDTH,
+                       help=f"Maximum tab line width; longer staffs are split into parts (default: {DISPLAY_WIDTH})")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Always decode and run inference instead of reusing cached audio and conversions")
+    parser.add_argument("--no-streaming", action="store_true",
+                       help="Decode and transcribe each file in one pass instead of bounded-memory segments")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND,
+                       help="Model format and runtime: TensorFlow SavedModel, TFLite or ONNX; auto uses "
+                            f"basic-pitch's default for the installed runtimes (default: {DEFAULT_BACKEND}, "
+                            "or TAB_GENER8OR_BACKEND)")
+    parser.add_argument("--threads", type=int, default=DEFAULT_INTRA_OP_THREADS,
+                       help="Threads per model call in each process; 0 uses the runtime default, except in "
+                            "batch runs where the cores are split between workers (TAB_GENER8OR_INTRA_OP_THREADS)")
+    parser.add_argument("--inter-op-threads", type=int, default=DEFAULT_INTER_OP_THREADS,
+                       help="Threads for running independent ops in parallel (TensorFlow and ONNX); "
+                            "0 uses the runtime default, or 1 per worker in batch runs (TAB_GENER8OR_INTER_OP_THREADS)")
+    parser.add_argument("--profile", metavar="JSON",
+                       help="Write per-stage wall time, CPU time and peak memory to this file; files are "
+                            "then converted one at a time (combine with --no-cache to time every stage)")
+    parser.add_argument("--profile-hook", choices=PROFILE_HOOKS,
+                       help="Also run each conversion under cProfile (<name>_profile.prof) or "
+                            "pyinstrument (<name>_profile.html) in the output directory")
     args = parser.parse_args()
     
-    # Process the audio file
-    results = process_audio_file(args.mp3_file)
+    mp3_files = collect_input_files(args.inputs)
+    if not mp3_files:
+        print("ERROR: No audio files matched the given inputs.")
+        sys.exit(1)
+    os.makedirs(args.output_dir, exist_ok=True)
+    
+    # Profiled runs stay in this process, so stages don't compete with other workers for the CPU
+    profiling = args.profile is not None or args.profile_hook is not None
+    if len(mp3_files) > 1 and args.jobs > 1 and not profiling:
+        start = time.perf_counter()
+        jobs = min(args.jobs, len(mp3_files))
+        # Each worker gets its share of the cores instead of a thread per core each
+        threads = args.threads or max(1, (os.cpu_count() or 1) // jobs)
+        model_options = {"backend": args.backend, "intra_op_threads": threads,
+                         "inter_op_threads": args.inter_op_threads or 1}
+        print(f"Converting {len(mp3_files)} files with {jobs} workers ({threads} inference threads each)...")
+        outcomes = run_batch(mp3_files, args.output_dir, jobs, not args.no_cache,
+                              args.tab_engine, args.width, not args.no_streaming, model_options)
+        print_batch_summary(outcomes, time.perf_counter() - start)
+        if not all(ok for _, ok, _, _ in outcomes):
+            sys.exit(1)
+        return
+    
+    # Load the model once and warm it up before processing
+    print("Loading basic-pitch model...")
+    transcriber = Transcriber(streaming=not args.no_streaming,
+                              pcm_cache=None if args.no_cache else PCMCache(), backend=args.backend,
+                              intra_op_threads=args.threads, inter_op_threads=args.inter_op_threads).warm_up()
+    cache = None if args.no_cache else ResultCache()
+    
+    # Process the audio files one after another with the same model
+    start = time.perf_counter()
+    outcomes = []
+    profiles = []
+    names = output_names(mp3_files)
+    for mp3_path in mp3_files:
+        file_start = time.perf_counter()
+        profiler = Profiler()
+        if args.profile_hook:
+            extension = ".prof" if args.profile_hook == "cprofile" else ".html"
+            hook_path = os.path.join(args.output_dir, f"{names[mp3_path]}_profile{extension}")
+            hook = profile_hook(args.profile_hook, hook_path)
+        else:
+            hook = contextlib.nullcontext()
+        with hook, profiler.activate() if args.profile else contextlib.nullcontext():
+            results = process_audio_file(mp3_path, transcriber, cache,
+                                         output_dir=args.output_dir, show_tabs=len(mp3_files) == 1,
+                                         tab_engine=args.tab_engine, width=args.width,
+                                         progress=print_progress if len(mp3_files) == 1 else None,
+                                         output_name=names[mp3_path])
+        error = None if results else "processing failed"
+        elapsed = time.perf_counter() - file_start
+        outcomes.append((mp3_path, results is not None, elapsed, error))
+        if args.profile:
+            print(f"\n--- Stage Profile: {mp3_path} ---\n{profiler.format_table()}\n")
+            profiles.append({"path": mp3_path, "ok": results is not None, "wall_s": elapsed, **profiler.to_dict()})
+        if args.profile_hook:
+            print(f"Call profile saved to {hook_path}")
+    
+    if len(mp3_files) > 1:
+        print_batch_summary(outcomes, time.perf_counter() - start)
+    
+    if args.profile:
+        with open(args.profile, "w") as f:
+            json.dump({"streaming": not args.no_streaming, "cache": not args.no_cache, "files": profiles}, f, indent=2)
+        print(f"Profile saved to {args.profile}")
     
-    if results:
+    if all(ok for _, ok, _, _ in outcomes):
         print("Done!")
     else:
         print("Processing failed.")
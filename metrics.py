@@ -0,0 +1,269 @@
+import bisect
+import logging
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Where the app serves /metrics for the scraper; port 0 turns the endpoint off
+DEFAULT_METRICS_HOST = os.environ.get("TAB_GENER8OR_METRICS_HOST", "127.0.0.1")
+DEFAULT_METRICS_PORT = int(os.environ.get("TAB_GENER8OR_METRICS_PORT", "9464"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Conversion and stage latencies span a few milliseconds (cache hits, tab
+# rendering) to many minutes (inference on long recordings)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+PREFIX = "tab_gener8or_"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    return repr(float(value))
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    """A named metric with one child per combination of label values."""
+
+    TYPE = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        # Unlabelled metrics are exported as 0 before their first update
+        if not self.labelnames:
+            self.labels()
+
+    def labels(self, *values, **kwargs):
+        """Return the child for these label values, creating it on first use."""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        values = tuple(str(value) for value in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        with self._lock:
+            child = self._children.get(values)
+            if child is None:
+                child = self._children[values] = self._new_child()
+            return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels; use .labels(...) first")
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def collect(self):
+        """Lines of the text exposition format for this metric."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            lines.extend(self._sample_lines(values, child))
+        return lines
+
+    def _sample_lines(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"]
+
+
+class _Value:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = 0.0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value):
+        with self._lock:
+            self._value = float(value)
+
+    def get(self):
+        with self._lock:
+            return self._value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. requests or failures."""
+
+    TYPE = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. queue depth."""
+
+    TYPE = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+
+    def observe(self, value):
+        # The last bucket is +Inf, so every value lands somewhere
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, for latency percentiles."""
+
+    TYPE = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def _sample_lines(self, values, child):
+        counts, total = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Process-wide set of metrics rendered in the Prometheus text format.
+
+    Metrics are registered once by name; registering the same name again
+    returns the existing metric, so modules that Streamlit re-executes can
+    declare theirs at import time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, cls, name, documentation, labelnames=(), **kwargs):
+        name = PREFIX + name
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.TYPE}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """All metrics in the text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serves REGISTRY at /metrics."""
+
+    def log_message(self, format, *args):
+        logging.getLogger("tab-gener8or.metrics").debug("%s - " + format, self.address_string(), *args)
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(host=DEFAULT_METRICS_HOST, port=DEFAULT_METRICS_PORT):
+    """
+    Serve /metrics on a daemon thread.
+
+    Returns:
+        ThreadingHTTPServer: The running server, or None when the port is 0 or
+            already taken (e.g. by another app process on the same host)
+    """
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        logging.getLogger("tab-gener8or.metrics").warning("Metrics endpoint not started on %s:%s: %s", host, port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,93 @@
+import contextlib
+import time
+
+from metrics import REGISTRY
+from profiling import Profiler, span
+from result_cache import make_cache_key
+from tabs import generate_tabs
+from transcriber import midi_to_bytes, report
+
+CONVERSIONS = REGISTRY.counter(
+    "conversions_total", "Conversions by tab engine and outcome (ok, cached or failed).", ("engine", "outcome"))
+CONVERSION_SECONDS = REGISTRY.histogram(
+    "conversion_duration_seconds", "End-to-end conversion latency, including time queued for inference.",
+    ("engine", "outcome"))
+STAGE_SECONDS = REGISTRY.histogram(
+    "stage_duration_seconds", "Time each conversion spent in a pipeline stage.", ("stage",))
+UPLOAD_BYTES = REGISTRY.counter("upload_bytes_total", "Bytes of audio received for conversion.")
+
+
+def convert_audio(audio_bytes, transcriber, cache=None, admission=None, tab_engine="native",
+                  suffix=".mp3", progress=None, on_segment=None, on_wait=None):
+    """
+    Run the audio ➜ MIDI ➜ tab pipeline on an uploaded file.
+
+    Shared by the Streamlit app, the HTTP server and the CLI, which each keep
+    one warm transcriber and cache per process (the CLI needs no admission
+    queue, it converts one file at a time per process).
+
+    Args:
+        audio_bytes (bytes): Raw contents of the audio file
+        transcriber (Transcriber): Loaded model shared across conversions
+        cache (ResultCache, optional): Conversion cache to read from and fill
+        admission (AdmissionQueue, optional): Limit on concurrent inferences
+        tab_engine (str): Tab engine to use, one of TAB_ENGINES
+        suffix (str): Extension hint for the decoder
+        progress (callable, optional): progress(stage, fraction) callback
+        on_segment (callable, optional): on_segment(start_s, end_s, note_events)
+            for partial results while inference runs
+        on_wait (callable, optional): on_wait(position) while queued for inference
+
+    Returns:
+        dict: "tabs", "tab_notes", "midi_bytes" and "note_events"
+    """
+    start = time.perf_counter()
+    UPLOAD_BYTES.inc(len(audio_bytes))
+    # Per-stage totals for the latency metrics; spans land in any caller's profiler too
+    stages = Profiler(trace_memory=False)
+    outcome = "failed"
+    try:
+        with stages.activate():
+            results, outcome = _convert(audio_bytes, transcriber, cache, admission, tab_engine,
+                                        suffix, progress, on_segment, on_wait)
+    finally:
+        CONVERSIONS.labels(tab_engine, outcome).inc()
+        CONVERSION_SECONDS.labels(tab_engine, outcome).observe(time.perf_counter() - start)
+        for stage, stats in stages.stages.items():
+            STAGE_SECONDS.labels(stage).observe(stats["wall_s"])
+    return results
+
+
+def _convert(audio_bytes, transcriber, cache, admission, tab_engine, suffix, progress, on_segment, on_wait):
+    """convert_audio() without the metrics; returns (results, outcome)."""
+    # Identical uploads with identical settings skip inference entirely
+    cache_key = None
+    if cache is not None:
+        cache_key = make_cache_key(audio_bytes, {**transcriber.params, "tab_engine": tab_engine})
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached, "cached"
+
+    # 1. audio ➜ midi; only a few inferences run at once, the rest wait their turn in order
+    slot = admission.slot(on_wait) if admission is not None else contextlib.nullcontext()
+    with slot:
+        model_out, midi_data, note_events = transcriber.predict(audio_bytes, suffix, progress, on_segment)
+    # Serialise the MIDI once, for both the tab stage and the download
+    with span("midi_write"):
+        midi_bytes = midi_to_bytes(midi_data)
+
+    # 2. notes ➜ tab, straight from the note events
+    report(progress, "tabs", 0.0)
+    with span("tab_render"):
+        tab_notes, tabs = generate_tabs(note_events, midi_bytes, tab_engine)
+    report(progress, "tabs", 1.0)
+
+    results = {
+        "tabs": tabs,
+        "tab_notes": tab_notes,
+        "midi_bytes": midi_bytes,
+        "note_events": note_events,
+    }
+    if cache is not None:
+        cache.put(cache_key, results)
+    return results, "ok"
@@ -0,0 +1,244 @@
+import contextlib
+import contextvars
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Pipeline stages in the order they run, for reports
+STAGES = ("upload_read", "decode", "inference", "notes", "midi_write", "tab_render", "display_format")
+
+PROFILE_HOOKS = ("cprofile", "pyinstrument")
+
+MB = 1024 * 1024
+
+# Profilers active for the conversion running in the current thread, innermost last
+_current = contextvars.ContextVar("tab_gener8or_profilers", default=())
+
+# tracemalloc is process-wide; it runs while any profiler that wants it is active
+_tracing_lock = threading.Lock()
+_tracing_profilers = set()
+# Conversions being traced: profilers nested in the same context count once
+_tracing_conversions = 0
+_tracing_started = False
+
+
+def _start_tracing(profiler, nested):
+    global _tracing_conversions, _tracing_started
+    with _tracing_lock:
+        if not _tracing_profilers and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        _tracing_profilers.add(profiler)
+        if not nested:
+            _tracing_conversions += 1
+        # There is one traced peak for the whole process, and every span
+        # resets it, so overlapping conversions corrupt each other's peaks
+        if _tracing_conversions > 1:
+            for active in _tracing_profilers:
+                active.memory_overlapped = True
+
+
+def _stop_tracing(profiler, nested):
+    global _tracing_conversions, _tracing_started
+    with _tracing_lock:
+        _tracing_profilers.discard(profiler)
+        if not nested:
+            _tracing_conversions -= 1
+        if not _tracing_profilers and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+
+def peak_rss_mb():
+    """Peak resident set size of the process so far in MiB, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (MB if sys.platform == "darwin" else 1024)
+
+
+class Profiler:
+    """
+    Wall time, CPU time and peak memory per pipeline stage of one conversion.
+
+    Stages are recorded with span(); a stage entered several times (e.g. one
+    inference call per window) accumulates its times and keeps its highest
+    peak. While activate()d, the module-level span() and iter_span() record
+    into this profiler, so the pipeline doesn't have to pass it around.
+    Profilers can be nested (the pipeline keeps one for its metrics while
+    the app or CLI keeps another); spans are recorded in all of them.
+
+    CPU time is the whole process's, so it includes TensorFlow's own threads
+    and, in the app, any conversion running at the same time. Peak memory is
+    what Python and NumPy allocated on top of the stage's starting point, as
+    seen by tracemalloc; model buffers allocated by TensorFlow aren't counted.
+    tracemalloc keeps a single peak for the process, so when another traced
+    conversion runs at the same time (e.g. two app sessions) the peaks can't
+    be told apart: the profiler is marked memory_overlapped and reports no
+    peaks rather than wrong ones.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.memory_overlapped = False
+        self.stages = {}
+        # [traced bytes at entry, highest peak seen] for each open span
+        self._stack = []
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Make this the profiler for span() calls in the current context."""
+        # Profilers nested in a traced one belong to the same conversion
+        nested = any(profiler.trace_memory for profiler in _current.get())
+        if self.trace_memory:
+            _start_tracing(self, nested)
+        token = _current.set(_current.get() + (self,))
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+            if self.trace_memory:
+                _stop_tracing(self, nested)
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """Record the enclosed block as (part of) stage ``name``."""
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            # Keep the enclosing span's peak before resetting it for this one
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            self._stack.append([current, current])
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            peak_mb = None
+            if tracing:
+                start, peak = self._stack.pop()
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], peak)
+                peak_mb = (peak - start) / MB
+
+            stats = self.stages.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_mb": None})
+            stats["calls"] += 1
+            stats["wall_s"] += wall
+            stats["cpu_s"] += cpu
+            if peak_mb is not None:
+                stats["peak_mb"] = max(stats["peak_mb"] or 0.0, peak_mb)
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: "stages" in pipeline order, each with calls, wall_s, cpu_s
+                and peak_mb (None when memory_overlapped), plus
+                "memory_overlapped" and the process's "peak_rss_mb"
+        """
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        names = sorted(self.stages, key=lambda name: order.get(name, len(STAGES)))
+        stages = {name: dict(self.stages[name]) for name in names}
+        if self.memory_overlapped:
+            for stats in stages.values():
+                stats["peak_mb"] = None
+        return {
+            "stages": stages,
+            "memory_overlapped": self.memory_overlapped,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+    def format_table(self):
+        """The recorded stages as a plain-text table for the console."""
+        report = self.to_dict()
+        lines = [f"{'stage':<16}{'calls':>7}{'wall s':>10}{'cpu s':>10}{'peak MiB':>10}"]
+        for name, stats in report["stages"].items():
+            peak = f"{stats['peak_mb']:.1f}" if stats["peak_mb"] is not None else "-"
+            lines.append(f"{name:<16}{stats['calls']:>7}{stats['wall_s']:>10.3f}{stats['cpu_s']:>10.3f}{peak:>10}")
+        if report["memory_overlapped"]:
+            lines.append("peak memory not reported: another traced conversion ran at the same time")
+        if report["peak_rss_mb"] is not None:
+            lines.append(f"process peak RSS: {report['peak_rss_mb']:.0f} MiB")
+        return "\n".join(lines)
+
+
+def _span(profilers, name):
+    if not profilers:
+        return contextlib.nullcontext()
+    if len(profilers) == 1:
+        return profilers[0].span(name)
+    stack = contextlib.ExitStack()
+    for profiler in profilers:
+        stack.enter_context(profiler.span(name))
+    return stack
+
+
+def span(name):
+    """Record the enclosed block in the active profilers; does nothing when none is active."""
+    return _span(_current.get(), name)
+
+
+def iter_span(name, iterable):
+    """Iterate ``iterable``, recording the time spent producing each item as stage ``name``."""
+    profilers = _current.get()
+    if not profilers:
+        return iterable
+    return _iter_span(profilers, name, iter(iterable))
+
+
+def _iter_span(profilers, name, iterator):
+    while True:
+        with _span(profilers, name):
+            item = next(iterator, StopIteration)
+        if item is StopIteration:
+            return
+        yield item
+
+
+@contextlib.contextmanager
+def profile_hook(kind, output_path):
+    """
+    Run the enclosed block under a call profiler and save its report.
+
+    Args:
+        kind (str): "cprofile" writes pstats data (``python -m pstats`` or
+            snakeviz can read it); "pyinstrument" writes an HTML call tree and
+            needs the optional pyinstrument package
+        output_path (str): Report file to write
+    """
+    if kind == "cprofile":
+        import cProfile
+
+        call_profiler = cProfile.Profile()
+        call_profiler.enable()
+        try:
+            yield
+        finally:
+            call_profiler.disable()
+            call_profiler.dump_stats(output_path)
+    elif kind == "pyinstrument":
+        try:
+            from pyinstrument import Profiler as CallProfiler
+        except ImportError:
+            raise RuntimeError("The pyinstrument hook needs pyinstrument: pip install pyinstrument") from None
+
+        call_profiler = CallProfiler()
+        call_profiler.start()
+        try:
+            yield
+        finally:
+            call_profiler.stop()
+            with open(output_path, "w") as f:
+                f.write(call_profiler.output_html())
+    else:
+        raise ValueError(f"Unknown profile hook '{kind}', expected one of {', '.join(PROFILE_HOOKS)}")
@@ -0,0 +1,259 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from metrics import REGISTRY
+
+# Bump whenever the stored result format or the tab rendering changes
+CACHE_VERSION = 3
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "TAB_GENER8OR_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "tab-gener8or", "results"),
+)
+DEFAULT_MAX_BYTES = int(os.environ.get("TAB_GENER8OR_CACHE_MB", "512")) * 1024 * 1024
+
+# Decoded audio is larger than the results, so it gets its own directory and budget
+DEFAULT_PCM_CACHE_DIR = os.environ.get(
+    "TAB_GENER8OR_PCM_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "tab-gener8or", "pcm"),
+)
+DEFAULT_PCM_MAX_BYTES = int(os.environ.get("TAB_GENER8OR_PCM_CACHE_MB", "2048")) * 1024 * 1024
+
+# Bump whenever decoding or resampling changes
+PCM_CACHE_VERSION = 1
+
+CACHE_LOOKUPS = REGISTRY.counter("cache_lookups_total", "Cache lookups by cache and result (hit or miss).",
+                                 ("cache", "result"))
+CACHE_EVICTIONS = REGISTRY.counter("cache_evictions_total", "Entries evicted to stay within the size budget.",
+                                   ("cache",))
+
+
+def make_cache_key(audio_bytes, params):
+    """
+    Build a content-addressed key for a conversion.
+
+    Args:
+        audio_bytes (bytes): Raw contents of the uploaded audio file
+        params (dict): Inference parameters that influence the result
+
+    Returns:
+        str: Hex digest identifying this audio/parameter combination
+    """
+    digest = hashlib.sha256()
+    digest.update(audio_bytes)
+    digest.update(json.dumps({"version": CACHE_VERSION, **params}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Persistent, size-bounded LRU cache of conversion results.
+
+    Each entry holds the MIDI bytes, note events, structured tab notes and tab
+    text of one conversion and lives in its own file, so several processes can
+    share the directory.
+    Reads refresh the file's mtime, and writes evict the least recently used
+    entries once the directory grows past ``max_bytes``.
+    """
+
+    SUFFIX = ".pkl"
+    # Label for the cache metrics
+    NAME = "result"
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"{key}{self.SUFFIX}"
+
+    def get(self, key):
+        """Return the cached result for ``key``, or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+            os.utime(path)  # mark as most recently used
+        except (OSError, EOFError, pickle.UnpicklingError):
+            CACHE_LOOKUPS.labels(self.NAME, "miss").inc()
+            return None
+        CACHE_LOOKUPS.labels(self.NAME, "hit").inc()
+        return result
+
+    def put(self, key, result):
+        """
+        Store a conversion result.
+
+        Args:
+            key (str): Key from make_cache_key()
+            result (dict): Must contain "midi_bytes", "note_events" and "tabs";
+                "tab_notes" is stored when present
+        """
+        entry = {
+            "midi_bytes": result["midi_bytes"],
+            "note_events": result["note_events"],
+            "tab_notes": result.get("tab_notes"),
+            "tabs": result["tabs"],
+        }
+        # Write to a temp file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._entry_path(key))
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if not entry.name.endswith(self.SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            for _, size, path in sorted(entries):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                CACHE_EVICTIONS.labels(self.NAME).inc()
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+
+class PCMCache(ResultCache):
+    """
+    Size-bounded LRU cache of decoded audio as .npy files.
+
+    Entries hold mono float32 samples at the model's sample rate and are
+    memory-mapped on read, so re-running a file with other thresholds or
+    after an upgrade skips decoding and resampling, and only the pages the
+    model touches are read from disk.
+    """
+
+    SUFFIX = ".npy"
+    NAME = "pcm"
+
+    # sample_rate defaults to Basic Pitch's AUDIO_SAMPLE_RATE
+    def __init__(self, cache_dir=DEFAULT_PCM_CACHE_DIR, max_bytes=DEFAULT_PCM_MAX_BYTES, sample_rate=22050):
+        super().__init__(cache_dir, max_bytes)
+        self.sample_rate = sample_rate
+
+    def make_key(self, audio_bytes):
+        """Key decoded audio by the encoded file's contents and the target sample rate."""
+        digest = hashlib.sha256()
+        digest.update(audio_bytes)
+        digest.update(f"pcm-v{PCM_CACHE_VERSION}-{self.sample_rate}".encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached samples as a read-only memory map, or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            audio = np.load(path, mmap_mode="r")
+            os.utime(path)  # mark as most recently used
+        except (OSError, ValueError):
+            CACHE_LOOKUPS.labels(self.NAME, "miss").inc()
+            return None
+        CACHE_LOOKUPS.labels(self.NAME, "hit").inc()
+        return audio
+
+    def put(self, key, audio):
+        """Store decoded samples."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.asarray(audio, dtype=np.float32))
+            os.replace(tmp_path, self._entry_path(key))
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        self._evict()
+
+    def put_blocks(self, key, blocks):
+        """
+        Pass decoded blocks through while writing them to the cache.
+
+        The samples are spooled to a raw temp file as they go by. Once the
+        stream is exhausted they are copied behind an .npy header, because
+        the header needs the final length, which streaming decoders only
+        know at the end. A stream that stops early leaves no entry behind.
+
+        Args:
+            key (str): Key from make_key()
+            blocks (iterable): Mono float32 blocks
+
+        Yields:
+            np.ndarray: The same blocks, unchanged
+        """
+        fd, raw_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        n_samples = 0
+        complete = False
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                for block in blocks:
+                    raw.write(np.ascontiguousarray(block, dtype=np.float32).tobytes())
+                    n_samples += len(block)
+                    yield block
+            complete = True
+        finally:
+            if complete:
+                self._commit_raw(key, raw_path, n_samples)
+            else:
+                try:
+                    os.unlink(raw_path)
+                except OSError:
+                    pass
+
+    def _commit_raw(self, key, raw_path, n_samples):
+        """Turn a spooled raw float32 file into a cache entry."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f, open(raw_path, "rb") as raw:
+                header = {"descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+                          "fortran_order": False, "shape": (n_samples,)}
+                np.lib.format.write_array_header_1_0(f, header)
+                shutil.copyfileobj(raw, f)
+            os.replace(tmp_path, self._entry_path(key))
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        finally:
+            try:
+                os.unlink(raw_path)
+            except OSError:
+                pass
+        self._evict()
@@ -0,0 +1,286 @@
+import argparse
+import base64
+import json
+import logging
+import os
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from transcriber import (BACKENDS, DEFAULT_BACKEND, DEFAULT_INTER_OP_THREADS, DEFAULT_INTRA_OP_THREADS,
+                         AudioDecodeError, Transcriber)
+from tabs import TAB_ENGINES, render_tab_section
+from result_cache import PCMCache, ResultCache
+from admission import AdmissionQueue
+from batching import DEFAULT_MAX_BATCH_SIZE
+from pipeline import convert_audio
+from metrics import CONTENT_TYPE, REGISTRY
+
+# Uploads larger than this are rejected before they are read
+MAX_UPLOAD_BYTES = int(os.environ.get("TAB_GENER8OR_MAX_UPLOAD_MB", "100")) * 1024 * 1024
+
+OUTPUT_FORMATS = ("json", "midi", "tab")
+
+
+def error_response(error):
+    """
+    Map a conversion failure to an HTTP status and message.
+
+    Returns:
+        tuple: (HTTPStatus, message); undecodable uploads are the client's
+            fault (422), anything else is a server error (500)
+    """
+    status = (HTTPStatus.UNPROCESSABLE_ENTITY if isinstance(error, AudioDecodeError)
+              else HTTPStatus.INTERNAL_SERVER_ERROR)
+    # Some exceptions (e.g. audioread's NoBackendError) have no message
+    return status, str(error) or type(error).__name__
+
+
+def result_to_json(results, include_midi=True):
+    """
+    Convert a pipeline result to plain JSON types.
+
+    Args:
+        results (dict): Result from convert_audio()
+        include_midi (bool): Embed the MIDI file as base64
+
+    Returns:
+        dict: "tabs", "note_events", "tab_notes" (None for Tayuya) and optionally "midi_base64"
+    """
+    payload = {
+        "tabs": results["tabs"],
+        "note_events": [
+            {"start": float(start), "end": float(end), "pitch": int(pitch), "amplitude": float(amplitude)}
+            for start, end, pitch, amplitude, _ in results["note_events"]
+        ],
+        "tab_notes": None,
+    }
+    if results.get("tab_notes") is not None:
+        payload["tab_notes"] = [note._asdict() for note in results["tab_notes"]]
+    if include_midi:
+        payload["midi_base64"] = base64.b64encode(results["midi_bytes"]).decode()
+    return payload
+
+
+class ConversionService:
+    """Warm model, cache and admission queue shared by every request thread."""
+
+    def __init__(self, use_cache=True, backend=DEFAULT_BACKEND, intra_op_threads=DEFAULT_INTRA_OP_THREADS,
+                 inter_op_threads=DEFAULT_INTER_OP_THREADS):
+        # Windows from concurrent requests are batched into shared model calls
+        self.transcriber = Transcriber(max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                                       pcm_cache=PCMCache() if use_cache else None, backend=backend,
+                                       intra_op_threads=intra_op_threads,
+                                       inter_op_threads=inter_op_threads).warm_up()
+        self.cache = ResultCache() if use_cache else None
+        self.admission = AdmissionQueue()
+
+    def convert(self, audio_bytes, suffix, tab_engine, progress=None, on_segment=None, on_wait=None):
+        return convert_audio(audio_bytes, self.transcriber, self.cache, self.admission, tab_engine,
+                             suffix, progress, on_segment, on_wait)
+
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    """
+    HTTP API for conversions.
+
+    GET  /health                  liveness check with the current queue depth
+    GET  /metrics                 Prometheus metrics in the text format
+    POST /convert?format=json     raw audio in the request body; format is
+                                  json (default), midi or tab; engine selects
+                                  the tab engine and filename its extension.
+                                  With stream=1 the response is NDJSON progress
+                                  events ending in a "result" event.
+    """
+
+    # Chunked transfer encoding for streamed responses needs HTTP/1.1
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    def log_message(self, format, *args):
+        logging.getLogger("tab-gener8or.server").info("%s - " + format, self.address_string(), *args)
+
+    def send_json(self, status, payload):
+        # An error sent before the request body is read leaves the body on the
+        # connection, where it would be parsed as the next request; close instead
+        if status >= HTTPStatus.BAD_REQUEST:
+            self.close_connection = True
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_bytes(self, content_type, body, filename=None):
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if filename:
+            self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/metrics":
+            self.send_bytes(CONTENT_TYPE, REGISTRY.render().encode())
+            return
+        if path != "/health":
+            self.send_json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+            return
+        admission = self.service.admission
+        self.send_json(HTTPStatus.OK, {
+            "status": "ok",
+            "running": admission.running,
+            "waiting": admission.waiting,
+        })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/convert":
+            self.send_json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+            return
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        output_format = query.get("format", "json")
+        tab_engine = query.get("engine", "native")
+        filename = query.get("filename", "upload.mp3")
+        stream = query.get("stream", "0").lower() in ("1", "true", "yes")
+        if output_format not in OUTPUT_FORMATS:
+            self.send_json(HTTPStatus.BAD_REQUEST, {"error": f"format must be one of {', '.join(OUTPUT_FORMATS)}"})
+            return
+        if tab_engine not in TAB_ENGINES:
+            self.send_json(HTTPStatus.BAD_REQUEST, {"error": f"engine must be one of {', '.join(TAB_ENGINES)}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self.send_json(HTTPStatus.LENGTH_REQUIRED, {"error": "Content-Length is required"})
+            return
+        if length <= 0:
+            self.send_json(HTTPStatus.BAD_REQUEST, {"error": "empty upload"})
+            return
+        if length > MAX_UPLOAD_BYTES:
+            self.send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "upload too large"})
+            return
+        audio_bytes = self.rfile.read(length)
+        suffix = Path(filename).suffix or ".mp3"
+
+        if stream:
+            self.stream_conversion(audio_bytes, suffix, tab_engine)
+            return
+
+        try:
+            results = self.service.convert(audio_bytes, suffix, tab_engine)
+        except Exception as e:
+            status, message = error_response(e)
+            self.send_json(status, {"error": message})
+            return
+
+        stem = Path(filename).stem
+        if output_format == "midi":
+            self.send_bytes("audio/midi", results["midi_bytes"], f"{stem}.mid")
+        elif output_format == "tab":
+            self.send_bytes("text/plain; charset=utf-8", results["tabs"].encode(), f"{stem}_tab.txt")
+        else:
+            self.send_json(HTTPStatus.OK, result_to_json(results))
+
+    def stream_conversion(self, audio_bytes, suffix, tab_engine):
+        """Run a conversion, streaming NDJSON events as chunks while it progresses."""
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        connected = True
+        last = {"stage": None, "percent": -1}
+
+        def send_event(event):
+            nonlocal connected
+            if not connected:
+                return
+            data = json.dumps(event).encode() + b"\n"
+            try:
+                self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+            except OSError:
+                # The client went away; finish the conversion so it still lands in the cache
+                connected = False
+
+        def progress(stage, fraction):
+            percent = int(fraction * 100)
+            # Only send whole-percent changes, not every inference window
+            if stage != last["stage"] or percent != last["percent"]:
+                last["stage"], last["percent"] = stage, percent
+                send_event({"event": "progress", "stage": stage, "fraction": round(fraction, 3)})
+
+        def on_wait(position):
+            send_event({"event": "queued", "position": position})
+
+        def on_segment(start_s, end_s, note_events):
+            event = {"event": "segment", "start": start_s, "end": end_s, "notes": len(note_events)}
+            if tab_engine == "native":
+                event["tabs"] = render_tab_section(note_events, start_s)
+            send_event(event)
+
+        try:
+            results = self.service.convert(audio_bytes, suffix, tab_engine, progress, on_segment, on_wait)
+            send_event({"event": "result", **result_to_json(results)})
+        except Exception as e:
+            # The 200 status is already sent, so the event carries the real one
+            status, message = error_response(e)
+            send_event({"event": "error", "status": int(status), "error": message})
+
+        if connected:
+            try:
+                self.wfile.write(b"0\r\n\r\n")
+            except OSError:
+                pass
+        self.close_connection = not connected
+
+
+def main():
+    """
+    Entry point for the HTTP API server.
+    Loads and warms the model once, then serves requests on a thread per connection.
+    """
+    parser = argparse.ArgumentParser(description="Serve audio-to-tab conversions over HTTP")
+    parser.add_argument("--host", default="127.0.0.1",
+                       help="Interface to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000,
+                       help="Port to listen on (default: 8000)")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Always run inference instead of reusing cached conversions")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND,
+                       help=f"Model format and runtime (default: {DEFAULT_BACKEND}, or TAB_GENER8OR_BACKEND)")
+    parser.add_argument("--threads", type=int, default=DEFAULT_INTRA_OP_THREADS,
+                       help="Threads per model call; 0 uses the runtime default (TAB_GENER8OR_INTRA_OP_THREADS)")
+    parser.add_argument("--inter-op-threads", type=int, default=DEFAULT_INTER_OP_THREADS,
+                       help="Threads for independent ops; 0 uses the runtime default (TAB_GENER8OR_INTER_OP_THREADS)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    print("Loading basic-pitch model...")
+    ConversionHandler.service = ConversionService(use_cache=not args.no_cache, backend=args.backend,
+                                                  intra_op_threads=args.threads,
+                                                  inter_op_threads=args.inter_op_threads)
+
+    server = ThreadingHTTPServer((args.host, args.port), ConversionHandler)
+    server.daemon_threads = True
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
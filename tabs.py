@@ -0,0 +1,348 @@
+import contextlib
+import re
+import sys
+import threading
+from collections import deque, namedtuple
+from io import StringIO
+
+import numpy as np
+
+from fingering import MAX_FRET, STANDARD_TUNING, group_chords, optimise_fingering
+
+# Printed string labels, high e (string 1) first
+STRING_NAMES = ("e", "B", "G", "D", "A", "E")
+
+# Rendering defaults: time resolution of a tab column and width of one staff
+COLUMNS_PER_SECOND = 8
+STAFF_LENGTH = 100
+TAB_LINE_CHAR = "-"
+
+# Default width when reflowing tab text for display, and the terminal codes stripped from it
+DISPLAY_WIDTH = 100
+ANSI_ESCAPE = re.compile(r"\x1B\[[0-9;]*[mK]")
+
+TAB_ENGINES = ("native", "tayuya")
+
+TabNote = namedtuple("TabNote", ["time", "string", "fret", "duration"])
+
+
+def note_events_to_tab(note_events, tuning=STANDARD_TUNING, max_fret=MAX_FRET):
+    """
+    Map Basic Pitch note events to string and fret positions.
+
+    Positions are chosen by the fingering optimiser, which minimises hand
+    movement and stretch over the whole piece.
+
+    Args:
+        note_events (list): (start_s, end_s, pitch, amplitude, pitch_bends) tuples
+        tuning (tuple): Open-string MIDI pitches, high string first
+        max_fret (int): Highest usable fret
+
+    Returns:
+        list: TabNote(time, string, fret, duration) entries sorted by time
+    """
+    chords = group_chords(note_events)
+    fingerings = optimise_fingering([[e[2] for e in chord] for chord in chords], tuning, max_fret)
+
+    tab_notes = []
+    for chord, fingering in zip(chords, fingerings):
+        # Notes the optimiser couldn't place are at the end of the chord and get dropped
+        for (start, end, _, _, _), (string, fret) in zip(chord, fingering):
+            tab_notes.append(TabNote(float(start), string, fret, float(end) - float(start)))
+    return tab_notes
+
+
+def rasterise_tab(tab_notes, columns_per_second=COLUMNS_PER_SECOND, n_strings=len(STRING_NAMES),
+                  start_time=0.0):
+    """
+    Lay tab notes out on a character grid, one row per string.
+
+    Onsets are quantised to columns, and notes sharing a column form one
+    group that is written straight down the staff. A single cursor runs
+    across all strings: when a group would overlap the previous group's
+    fret numbers plus one dash, it moves right, and every later group
+    moves with it, so chords stay vertical. With G the widths of earlier
+    groups, the group columns are a running maximum of ``column - G``, so
+    the whole layout is a handful of NumPy passes with no per-note Python
+    loop.
+
+    Args:
+        tab_notes (list): TabNote entries from note_events_to_tab()
+        columns_per_second (int): Time resolution of one tab column
+        n_strings (int): Number of grid rows
+        start_time (float): Time, in seconds, of the grid's first column
+
+    Returns:
+        np.ndarray: (n_strings, n_columns) uint8 array of ASCII characters
+    """
+    if not tab_notes:
+        return np.full((n_strings, 0), ord(TAB_LINE_CHAR), dtype=np.uint8)
+
+    notes = np.array([(n.time, n.string, n.fret) for n in tab_notes], dtype=np.float64)
+    rows = notes[:, 1].astype(np.int64) - 1
+    frets = notes[:, 2].astype(np.int64)
+    columns = np.rint((notes[:, 0] - start_time) * columns_per_second).astype(np.int64) + 1
+    widths = np.where(frets >= 10, 2, 1)
+
+    # Two notes on one string in the same column can't share a group; the
+    # later one starts the next group in that column
+    order = np.lexsort((notes[:, 0], rows, columns))
+    same_cell = np.r_[False, (columns[order][1:] == columns[order][:-1]) & (rows[order][1:] == rows[order][:-1])]
+    run_starts = np.flatnonzero(~same_cell)
+    run_ids = np.cumsum(~same_cell) - 1
+    ranks = np.empty_like(columns)
+    ranks[order] = np.arange(len(order)) - run_starts[run_ids]
+
+    # One group per (column, rank), in time order, as wide as its widest fret
+    keys, groups = np.unique(np.stack([columns, ranks], axis=1), axis=0, return_inverse=True)
+    groups = groups.reshape(-1)
+    group_widths = np.zeros(len(keys), dtype=np.int64)
+    np.maximum.at(group_widths, groups, widths)
+
+    # Space taken by earlier groups (fret digits plus a dash), shared by all strings
+    taken = np.cumsum(group_widths + 1) - (group_widths + 1)
+    group_columns = np.maximum.accumulate(keys[:, 0] - taken) + taken
+    columns = group_columns[groups]
+
+    n_columns = int((columns + widths).max()) + 1
+    grid = np.full((n_strings, n_columns), ord(TAB_LINE_CHAR), dtype=np.uint8)
+    two_digits = widths == 2
+    grid[rows, columns] = np.where(two_digits, frets // 10, frets) + ord("0")
+    grid[rows[two_digits], columns[two_digits] + 1] = frets[two_digits] % 10 + ord("0")
+    return grid
+
+
+def render_tab_text(tab_notes, columns_per_second=COLUMNS_PER_SECOND, staff_length=STAFF_LENGTH,
+                    string_names=STRING_NAMES, start_time=0.0):
+    """
+    Render structured tab notes as ASCII tablature.
+
+    Args:
+        tab_notes (list): TabNote entries from note_events_to_tab()
+        columns_per_second (int): Time resolution of one tab column
+        staff_length (int): Maximum number of columns per staff line
+        string_names (tuple): Label for each string, high string first
+        start_time (float): Time, in seconds, where the tab starts; used to
+            render a later section of a piece on its own
+
+    Returns:
+        str: Staffs of six "e|---3---|" lines separated by blank lines
+    """
+    if not tab_notes:
+        return ""
+
+    grid = rasterise_tab(tab_notes, columns_per_second, len(string_names), start_time)
+    total = grid.shape[1]
+
+    # Break staffs only at columns that are dashes on every string, so
+    # multi-digit frets are never split
+    blank = np.flatnonzero((grid == ord(TAB_LINE_CHAR)).all(axis=0))
+    breaks = []
+    start = 0
+    while start + staff_length < total:
+        end = start + staff_length
+        candidate = blank[np.searchsorted(blank, end, side="right") - 1]
+        end = int(candidate) if candidate > start else end
+        breaks.append((start, end))
+        start = end
+    breaks.append((start, total))
+
+    # Decode each row once and slice the staffs out of the resulting strings
+    lines = [row.tobytes().decode("ascii") for row in grid]
+    staffs = (
+        "\n".join(f"{name}|{line[start:end]}|" for name, line in zip(string_names, lines))
+        for start, end in breaks
+    )
+    return "\n\n".join(staffs) + "\n"
+
+
+def iter_lines(text):
+    """Yield the lines of ``text`` one at a time without building a list of them."""
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start)
+        if end == -1:
+            end = len(text)
+        yield text[start:end]
+        start = end + 1
+
+
+def iter_tab_lines(tab_text):
+    """
+    Yield tab lines with ANSI codes removed and outer blank lines dropped.
+
+    Trailing blank lines are held back until a non-blank line follows, so the
+    output matches ``tab_text.strip().split("\n")`` without copying the text.
+    """
+    pending_blank = 0
+    started = False
+    for line in iter_lines(tab_text):
+        if "\x1b" in line:
+            line = ANSI_ESCAPE.sub("", line)
+        if not line.strip():
+            pending_blank += started
+            continue
+        if not started:
+            line = line.lstrip()
+            started = True
+        for _ in range(pending_blank):
+            yield ""
+        pending_blank = 0
+        yield line
+
+
+def iter_formatted_tab(tab_text, width=DISPLAY_WIDTH):
+    """
+    Reflow tablature to a maximum width, yielding text chunks as it goes.
+
+    Six consecutive lines containing "|" are treated as one staff. Staffs
+    wider than ``width`` are split into labelled parts, each line keeping
+    its string name, and every staff is followed by a blank line. Other
+    lines pass through unchanged. Each line is sliced once per part, so the
+    work is linear in the size of the tab.
+
+    Args:
+        tab_text (str): Raw tablature text
+        width (int): Maximum number of columns per part
+
+    Yields:
+        str: Formatted text, one staff part (or pass-through line) per chunk
+    """
+    window = deque()
+    lines = iter_tab_lines(tab_text)
+    while True:
+        # Keep six lines of lookahead to spot a staff
+        while len(window) < 6:
+            line = next(lines, None)
+            if line is None:
+                break
+            window.append(line)
+        if not window:
+            return
+
+        if len(window) < 6 or not all("|" in line for line in window):
+            yield window.popleft() + "\n"
+            continue
+
+        chunk = [window.popleft() for _ in range(6)]
+        max_length = max(len(line) for line in chunk)
+        if max_length <= width:
+            # Lines are short enough, no need to split
+            yield "\n".join(chunk) + "\n\n"
+            continue
+
+        segments = (max_length + width - 1) // width
+        prefixes = [line[:line.index("|") + 1] for line in chunk]
+        for seg in range(segments):
+            start = seg * width
+            # Don't create empty segments
+            if start >= len(chunk[0]):
+                break
+            if seg == 0:
+                segment_lines = [line[:width] for line in chunk]
+            else:
+                # Repeat the string name (E, A, D, G, B, e) on every part
+                segment_lines = [prefix + line[start:start + width] for prefix, line in zip(prefixes, chunk)]
+            label = f"--- Part {seg + 1}/{segments} ---\n"
+            separator = "\n" if seg < segments - 1 else ""
+            yield label + "\n".join(segment_lines) + "\n" + separator
+        yield "\n"
+
+
+def format_tab_for_display(tab_text, width=DISPLAY_WIDTH):
+    """
+    Format tablature text to better fit screen width.
+
+    Args:
+        tab_text (str): The raw tablature text
+        width (int): Maximum number of columns per line segment
+
+    Returns:
+        str: Formatted tablature text with properly split lines
+    """
+    return "".join(iter_formatted_tab(tab_text, width))
+
+
+class ThreadLocalStdout:
+    """
+    sys.stdout proxy that lets each thread redirect its own output.
+
+    Swapping sys.stdout itself is process-wide, so two Streamlit sessions
+    capturing at once would steal each other's output. Threads that aren't
+    capturing write through to the original stream.
+    """
+
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def _target(self):
+        target = getattr(self.local, "target", None)
+        return target if target is not None else self.default
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        return self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+
+_stdout_lock = threading.Lock()
+
+
+def _thread_local_stdout():
+    """Install the ThreadLocalStdout proxy on first use and return it."""
+    with _stdout_lock:
+        if not isinstance(sys.stdout, ThreadLocalStdout):
+            sys.stdout = ThreadLocalStdout(sys.stdout)
+        return sys.stdout
+
+
+@contextlib.contextmanager
+def capture_stdout():
+    """Capture what the current thread prints, leaving other threads untouched."""
+    proxy = _thread_local_stdout()
+    previous = getattr(proxy.local, "target", None)
+    string_io = StringIO()
+    proxy.local.target = string_io
+    try:
+        yield string_io
+    finally:
+        proxy.local.target = previous
+
+
+def render_tab_section(note_events, start_time=0.0):
+    """
+    Render one section of a piece with the native engine, e.g. a streamed segment.
+
+    Fingerings are only optimised within the section, so the full tab from
+    generate_tabs() can differ slightly at section boundaries.
+    """
+    if not note_events:
+        return ""
+    return render_tab_text(note_events_to_tab(note_events), start_time=start_time)
+
+
+def generate_tabs(note_events, midi_bytes, engine="native"):
+    """
+    Produce tablature with the selected engine.
+
+    Args:
+        note_events (list): Note events from Basic Pitch
+        midi_bytes (bytes): Serialised MIDI, used by the Tayuya engine
+        engine (str): One of TAB_ENGINES
+
+    Returns:
+        tuple: (tab_notes, tab_text); tab_notes is None for the Tayuya engine
+    """
+    if engine == "native":
+        tab_notes = note_events_to_tab(note_events)
+        return tab_notes, render_tab_text(tab_notes)
+    if engine == "tayuya":
+        # Tayuya pulls in music21, which is slow to import, so load it only when asked for
+        from tayuya_tabs import render_tayuya_tabs
+        return None, render_tayuya_tabs(midi_bytes)
+    raise ValueError(f"Unknown tab engine: {engine}")
@@ -0,0 +1,56 @@
+import io
+
+import mido
+from music21 import stream
+from tayuya import MIDIParser
+from tayuya.exceptions import TrackError
+
+from tabs import capture_stdout
+
+# pretty_midi writes tempo/meta events to track 0 and the notes to track 1
+NOTE_TRACK = 1
+
+
+class InMemoryMIDIParser(MIDIParser):
+    """
+    Tayuya parser built from an already-loaded mido.MidiFile.
+
+    MIDIParser only accepts a file path, which forces a MIDI write/read round
+    trip through disk. This mirrors its constructor for an in-memory file.
+    """
+
+    def __init__(self, midi_file, track=0):
+        self.midi_file = midi_file
+        self.track = track
+        self.midi_data = self.midi_file.tracks[track]
+
+        # Get time signature
+        ts_meta = [msg for msg in self.midi_data if msg.type == "time_signature"]
+        if ts_meta:
+            self.time_signature = (ts_meta[0].numerator, ts_meta[0].denominator)
+        else:
+            self.time_signature = (4, 4)
+
+        self.stream = stream.Stream()
+
+        if not self.midi_data:
+            raise TrackError
+
+
+def render_tayuya_tabs(midi_bytes):
+    """
+    Render guitar tab text from serialised MIDI with Tayuya (legacy engine).
+
+    Args:
+        midi_bytes (bytes): Standard MIDI File bytes
+
+    Returns:
+        str: Tab text as printed by Tayuya
+    """
+    midi_file = mido.MidiFile(file=io.BytesIO(midi_bytes))
+    mid = InMemoryMIDIParser(midi_file, track=NOTE_TRACK)
+
+    # Since render_tabs() returns None but prints to stdout, we'll capture the output
+    with capture_stdout() as captured:
+        mid.render_tabs()
+    return captured.getvalue()
@@ -0,0 +1,699 @@
+import io
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+import numpy as np
+
+from batching import BatchingModel
+from profiling import iter_span, span
+
+# basic_pitch, librosa and the audio I/O libraries are imported where they are
+# used: importing basic_pitch loads TensorFlow, which would otherwise delay the
+# Streamlit page and even `main.py --help` by several seconds.
+# These mirror basic_pitch.constants (basic-pitch is pinned to 0.4.0) and are
+# checked against it when the model loads.
+AUDIO_SAMPLE_RATE = 22050
+FFT_HOP = 256
+AUDIO_N_SAMPLES = AUDIO_SAMPLE_RATE * 2 - FFT_HOP
+ANNOTATIONS_FPS = AUDIO_SAMPLE_RATE // FFT_HOP
+
+# Same windowing as basic_pitch.inference.run_inference: 30 overlapping frames
+N_OVERLAPPING_FRAMES = 30
+OVERLAP_LEN = N_OVERLAPPING_FRAMES * FFT_HOP
+HOP_SIZE = AUDIO_N_SAMPLES - OVERLAP_LEN
+
+# Streaming mode decodes the input in blocks and extracts notes per segment
+# of model frames, with a margin of context on both sides so notes near a
+# boundary are found with the same surroundings as in a whole-file run
+STREAM_BLOCK_SECONDS = 10
+SEGMENT_FRAMES = 30 * ANNOTATIONS_FPS
+# The first segment is short so callers can show notes a few seconds in
+FIRST_SEGMENT_FRAMES = 5 * ANNOTATIONS_FPS
+MARGIN_FRAMES = 4 * ANNOTATIONS_FPS
+# A note still sounding at the end of the buffered frames isn't cut there:
+# the segment waits for more audio, up to this far past its end, so the
+# note gets its full length as in a whole-file run
+MAX_LOOKAHEAD_FRAMES = 60 * ANNOTATIONS_FPS
+# Frames below the threshold that output_to_notes_polyphonic() tolerates
+# inside a note (its energy_tol)
+NOTE_ENERGY_TOL = 11
+
+# Input formats accepted by the app and the CLI; WAV, FLAC and OGG are read
+# by libsndfile, MP3 and M4A fall back to audioread/ffmpeg if needed
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg", ".m4a")
+
+# WAV format tags understood by the resample-free fast path
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Model serialisations, each run by its own runtime; "auto" keeps
+# basic_pitch's default for whichever runtimes are installed
+BACKENDS = ("auto", "tf", "tflite", "onnx")
+DEFAULT_BACKEND = os.environ.get("TAB_GENER8OR_BACKEND", "auto")
+
+# Threads used inside one model call (intra-op) and across independent ops
+# (inter-op, TensorFlow and ONNX only); 0 keeps the runtime's default of
+# roughly one per core, which oversubscribes the CPU with several workers
+DEFAULT_INTRA_OP_THREADS = int(os.environ.get("TAB_GENER8OR_INTRA_OP_THREADS", "0"))
+DEFAULT_INTER_OP_THREADS = int(os.environ.get("TAB_GENER8OR_INTER_OP_THREADS", "0"))
+
+# Stages reported to progress callbacks, in pipeline order. Callbacks are
+# called as progress(stage, fraction) with fraction in [0, 1]; "tabs" is
+# reported by the callers that render the tab.
+PROGRESS_STAGES = ("decode", "inference", "notes", "tabs")
+
+
+def report(progress, stage, fraction):
+    """Forward a progress event if a callback was given."""
+    if progress is not None:
+        progress(stage, fraction)
+
+
+class AudioDecodeError(ValueError):
+    """The input isn't audio any installed decoder can read; a client error, not a server fault."""
+
+
+def _decode_error(error):
+    # audioread's NoBackendError has no message of its own
+    return AudioDecodeError(f"could not decode audio ({str(error) or type(error).__name__})")
+
+
+def read_model_rate_wav(source):
+    """
+    Read a WAV file that is already mono at the model's sample rate, without resampling.
+
+    32-bit float samples are returned as a zero-copy view of the input buffer
+    (or of a memory map of the file); 16-bit PCM only needs scaling to float.
+    Anything else, including every non-WAV input, returns None so the caller
+    falls back to the regular decoder.
+
+    Args:
+        source: File path or raw bytes
+
+    Returns:
+        np.ndarray or None: Mono float32 samples at AUDIO_SAMPLE_RATE
+    """
+    if isinstance(source, (str, os.PathLike)):
+        try:
+            with open(source, "rb") as f:
+                if f.read(4) != b"RIFF":
+                    return None
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+    elif isinstance(source, (bytes, bytearray)):
+        data = source
+    else:
+        return None
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+
+    # Walk the RIFF chunks: "fmt " describes the samples, "data" holds them
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = bytes(data[pos:pos + 4])
+        size, = struct.unpack_from("<I", data, pos + 4)
+        body = pos + 8
+        if chunk_id == b"fmt " and size >= 16:
+            tag, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", data, body)
+            if tag == WAVE_FORMAT_EXTENSIBLE and size >= 40:
+                tag, = struct.unpack_from("<H", data, body + 24)
+            fmt = (tag, channels, rate, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            tag, channels, rate, bits = fmt
+            if channels != 1 or rate != AUDIO_SAMPLE_RATE:
+                return None
+            # Streamed WAVs may leave the size at its maximum
+            size = min(size, len(data) - body)
+            if tag == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+                return np.frombuffer(data, dtype="<f4", count=size // 4, offset=body)
+            if tag == WAVE_FORMAT_PCM and bits == 16:
+                samples = np.frombuffer(data, dtype="<i2", count=size // 2, offset=body)
+                return samples.astype(np.float32) / 32768
+            return None
+        pos = body + size + (size & 1)
+    return None
+
+
+def decode_audio(source, suffix=".mp3"):
+    """
+    Decode audio to mono float32 samples at the model's sample rate.
+
+    Args:
+        source: File path, raw bytes or a binary file-like object
+        suffix (str): Extension hint used if the decoder needs a real file
+
+    Returns:
+        np.ndarray: Mono float32 samples at AUDIO_SAMPLE_RATE
+
+    Raises:
+        AudioDecodeError: If no decoder can read the input
+    """
+    audio = read_model_rate_wav(source)
+    if audio is not None:
+        return audio
+
+    import librosa
+
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    if isinstance(source, (str, os.PathLike)):
+        if not os.path.exists(source):
+            raise FileNotFoundError(source)
+        try:
+            audio, _ = librosa.load(source, sr=AUDIO_SAMPLE_RATE, mono=True)
+        except Exception as e:
+            raise _decode_error(e) from e
+        return audio
+
+    try:
+        # libsndfile decodes straight from the in-memory buffer
+        audio, _ = librosa.load(source, sr=AUDIO_SAMPLE_RATE, mono=True)
+        return audio
+    except Exception:
+        # Older libsndfile builds can't read MP3; audioread needs a real file
+        source.seek(0)
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp_audio:
+            tmp_audio.write(source.read())
+            tmp_audio_path = tmp_audio.name
+        try:
+            audio, _ = librosa.load(tmp_audio_path, sr=AUDIO_SAMPLE_RATE, mono=True)
+            return audio
+        except Exception as e:
+            raise _decode_error(e) from e
+        finally:
+            os.unlink(tmp_audio_path)
+
+
+def open_audio_stream(source, suffix=".mp3", block_seconds=STREAM_BLOCK_SECONDS):
+    """
+    Decode audio incrementally to mono float32 blocks at the model's sample rate.
+
+    Formats libsndfile can read are decoded block by block and resampled with
+    a streaming resampler, so memory doesn't grow with the file's length.
+    Anything else falls back to decode_audio() and is sliced afterwards.
+
+    Args:
+        source: File path, raw bytes or a binary file-like object
+        suffix (str): Extension hint used by the fallback decoder
+        block_seconds (float): Length of each decoded block
+
+    Returns:
+        tuple: (expected number of output samples or None, iterator of blocks)
+
+    Raises:
+        AudioDecodeError: If no decoder can read the input, possibly only
+            once the blocks are read
+    """
+    block_size = int(block_seconds * AUDIO_SAMPLE_RATE)
+    audio = read_model_rate_wav(source)
+    if audio is not None:
+        return len(audio), (audio[start:start + block_size] for start in range(0, len(audio), block_size))
+
+    import soundfile
+    import soxr
+
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    try:
+        sound_file = soundfile.SoundFile(source)
+    except (RuntimeError, TypeError):
+        if hasattr(source, "seek"):
+            source.seek(0)
+        audio = decode_audio(source, suffix)
+        blocks = (audio[start:start + block_size] for start in range(0, len(audio), block_size))
+        return len(audio), blocks
+
+    def read_blocks():
+        with sound_file:
+            resampler = None
+            if sound_file.samplerate != AUDIO_SAMPLE_RATE:
+                resampler = soxr.ResampleStream(sound_file.samplerate, AUDIO_SAMPLE_RATE, 1, dtype="float32")
+            in_block_size = int(block_seconds * sound_file.samplerate)
+            blocks = sound_file.blocks(blocksize=in_block_size, dtype="float32", always_2d=True)
+            while True:
+                try:
+                    block = next(blocks, None)
+                except RuntimeError as e:
+                    # A file that is corrupt past its header
+                    raise _decode_error(e) from e
+                if block is None:
+                    break
+                mono = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+                yield resampler.resample_chunk(mono) if resampler is not None else mono
+            if resampler is not None:
+                yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+
+    n_samples = None
+    if sound_file.frames > 0:
+        n_samples = int(round(sound_file.frames * AUDIO_SAMPLE_RATE / sound_file.samplerate))
+    return n_samples, read_blocks()
+
+
+def midi_to_bytes(midi_data):
+    """Serialise a PrettyMIDI object to Standard MIDI File bytes without touching disk."""
+    buffer = io.BytesIO()
+    midi_data.write(buffer)
+    return buffer.getvalue()
+
+
+def check_constants():
+    """Fail loudly if the mirrored constants no longer match the installed basic_pitch."""
+    from basic_pitch import constants
+
+    expected = (constants.AUDIO_SAMPLE_RATE, constants.FFT_HOP, constants.AUDIO_N_SAMPLES,
+                constants.ANNOTATIONS_FPS)
+    if expected != (AUDIO_SAMPLE_RATE, FFT_HOP, AUDIO_N_SAMPLES, ANNOTATIONS_FPS):
+        raise RuntimeError(f"basic_pitch constants changed: {expected}")
+
+
+def resolve_model_path(backend=DEFAULT_BACKEND):
+    """Path of the ICASSP 2022 model serialised for ``backend``, one of BACKENDS."""
+    import basic_pitch
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    if backend == "auto":
+        return basic_pitch.ICASSP_2022_MODEL_PATH
+    return basic_pitch.build_icassp_2022_model_path(basic_pitch.FilenameSuffix[backend])
+
+
+def set_tensorflow_threads(intra_op_threads=0, inter_op_threads=0):
+    """
+    Limit TensorFlow's thread pools for this process.
+
+    Only takes effect before TensorFlow runs its first op, i.e. before the
+    model is loaded; does nothing when TensorFlow isn't installed.
+    """
+    if not intra_op_threads and not inter_op_threads:
+        return
+    try:
+        import tensorflow as tf
+    except ImportError:
+        return
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError:
+        # TensorFlow is already initialised, e.g. by an earlier model in this process
+        pass
+
+
+class SharedModel:
+    """
+    Basic Pitch model that can be shared by every thread in the process.
+
+    TensorFlow saved models are safe to call concurrently, but TFLite, ONNX
+    and CoreML runners keep per-instance buffers, so calls to those are
+    serialised with a lock.
+
+    basic_pitch picks the runtime from the model file and doesn't expose
+    thread settings, so TFLite interpreters and ONNX sessions are recreated
+    with the requested thread counts.
+    """
+
+    # Model type basic_pitch reports for each explicitly chosen backend
+    BACKEND_MODEL_TYPES = {"tf": "TENSORFLOW", "tflite": "TFLITE", "onnx": "ONNX"}
+
+    def __init__(self, model_path, backend="auto", intra_op_threads=0, inter_op_threads=0):
+        if backend in ("auto", "tf"):
+            set_tensorflow_threads(intra_op_threads, inter_op_threads)
+
+        from basic_pitch.inference import Model
+
+        check_constants()
+        self.model = Model(model_path)
+        self.model_type = self.model.model_type
+        expected = self.BACKEND_MODEL_TYPES.get(backend)
+        if expected is not None and self.model_type.name != expected:
+            raise RuntimeError(f"{model_path} loaded with {self.model_type.name} instead of the "
+                               f"{backend} backend; is its runtime installed?")
+
+        if self.model_type == Model.MODEL_TYPES.TFLITE and intra_op_threads:
+            try:
+                import tflite_runtime.interpreter as tflite
+            except ImportError:
+                from tensorflow import lite as tflite
+            self.model.interpreter = tflite.Interpreter(str(model_path), num_threads=intra_op_threads)
+            self.model.model = self.model.interpreter.get_signature_runner()
+        elif self.model_type == Model.MODEL_TYPES.ONNX and (intra_op_threads or inter_op_threads):
+            import onnxruntime as ort
+
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = intra_op_threads
+            options.inter_op_num_threads = inter_op_threads
+            self.model.model = ort.InferenceSession(str(model_path), sess_options=options,
+                                                    providers=self.model.model.get_providers())
+
+        self._concurrent = self.model_type == Model.MODEL_TYPES.TENSORFLOW
+        self._lock = threading.Lock()
+
+    def predict(self, x):
+        if self._concurrent:
+            return self.model.predict(x)
+        with self._lock:
+            return self.model.predict(x)
+
+
+class Transcriber:
+    """
+    Long-lived owner of a loaded Basic Pitch model.
+
+    Loading and initialising the model costs seconds on CPU, so each process
+    should create a single Transcriber and reuse it for every conversion.
+    With ``max_batch_size`` above 1, windows from concurrent conversions are
+    batched into shared model calls. With a ``pcm_cache``, decoded audio is
+    kept on disk and memory-mapped when the same file comes back.
+    ``backend`` picks the model serialisation and runtime (one of BACKENDS)
+    when no ``model_path`` is given, and the thread counts bound how many
+    cores each model call may use.
+    """
+
+    def __init__(self, model_path=None, onset_threshold=0.5,
+                 frame_threshold=0.3, minimum_note_length=127.70, streaming=True,
+                 max_batch_size=1, pcm_cache=None, backend=DEFAULT_BACKEND,
+                 intra_op_threads=DEFAULT_INTRA_OP_THREADS, inter_op_threads=DEFAULT_INTER_OP_THREADS):
+        if model_path is None:
+            model_path = resolve_model_path(backend)
+        self.model_path = model_path
+        self.backend = backend
+        self.onset_threshold = onset_threshold
+        self.frame_threshold = frame_threshold
+        self.minimum_note_length = minimum_note_length
+        self.streaming = streaming
+        self.pcm_cache = pcm_cache
+        self.model = SharedModel(model_path, backend, intra_op_threads, inter_op_threads)
+        if max_batch_size > 1:
+            self.model = BatchingModel(self.model, max_batch_size)
+
+    @property
+    def min_note_len_frames(self):
+        """Minimum note length converted from milliseconds to model frames."""
+        return int(np.round(self.minimum_note_length / 1000 * (AUDIO_SAMPLE_RATE / FFT_HOP)))
+
+    @property
+    def params(self):
+        """Inference parameters that affect the transcription, e.g. for cache keys."""
+        return {
+            "model": os.path.basename(str(self.model_path)),
+            "onset_threshold": self.onset_threshold,
+            "frame_threshold": self.frame_threshold,
+            "minimum_note_length": self.minimum_note_length,
+            "streaming": self.streaming,
+        }
+
+    def warm_up(self):
+        """Run one inference on silence so the first real request skips model setup."""
+        silence = np.zeros((1, AUDIO_N_SAMPLES, 1), dtype=np.float32)
+        self.model.predict(silence)
+        return self
+
+    def _pcm_key(self, source):
+        """PCM cache key for raw audio bytes, or None when there is nothing to cache."""
+        if self.pcm_cache is None or not isinstance(source, (bytes, bytearray)):
+            return None
+        return self.pcm_cache.make_key(source)
+
+    def decode(self, source, suffix=".mp3"):
+        """decode_audio() through the PCM cache; cached audio comes back memory-mapped."""
+        key = self._pcm_key(source)
+        if key is not None:
+            audio = self.pcm_cache.get(key)
+            if audio is not None:
+                return audio
+        audio = decode_audio(source, suffix)
+        if key is not None:
+            self.pcm_cache.put(key, audio)
+        return audio
+
+    def open_stream(self, source, suffix=".mp3"):
+        """open_audio_stream() through the PCM cache; new decodes are written to it as they stream."""
+        key = self._pcm_key(source)
+        if key is not None:
+            audio = self.pcm_cache.get(key)
+            if audio is not None:
+                block_size = int(STREAM_BLOCK_SECONDS * AUDIO_SAMPLE_RATE)
+                return len(audio), (audio[start:start + block_size] for start in range(0, len(audio), block_size))
+        n_samples, blocks = open_audio_stream(source, suffix)
+        if key is not None:
+            blocks = self.pcm_cache.put_blocks(key, blocks)
+        return n_samples, blocks
+
+    def transcribe(self, audio, progress=None):
+        """
+        Run the model over decoded audio and extract notes.
+
+        Args:
+            audio (np.ndarray): Mono float32 samples at AUDIO_SAMPLE_RATE
+            progress (callable, optional): progress(stage, fraction) callback
+
+        Returns:
+            tuple: (model_output, midi_data, note_events) as returned by Basic Pitch
+        """
+        import basic_pitch.note_creation as infer
+        from basic_pitch.inference import unwrap_output, window_audio_file
+
+        original_length = audio.shape[0]
+        padded = np.concatenate([np.zeros(OVERLAP_LEN // 2, dtype=np.float32), audio])
+
+        n_windows = -(-padded.shape[0] // HOP_SIZE)
+        output = {"note": [], "onset": [], "contour": []}
+        report(progress, "inference", 0.0)
+        with span("inference"):
+            for i, (window, _) in enumerate(window_audio_file(padded, HOP_SIZE)):
+                for k, v in self.model.predict(np.expand_dims(window, axis=0)).items():
+                    output[k].append(v)
+                report(progress, "inference", (i + 1) / n_windows)
+        report(progress, "notes", 0.0)
+        with span("notes"):
+            model_output = {
+                k: unwrap_output(np.concatenate(v), original_length, N_OVERLAPPING_FRAMES)
+                for k, v in output.items()
+            }
+
+            midi_data, note_events = infer.model_output_to_notes(
+                model_output,
+                onset_thresh=self.onset_threshold,
+                frame_thresh=self.frame_threshold,
+                min_note_len=self.min_note_len_frames,
+            )
+        report(progress, "notes", 1.0)
+        return model_output, midi_data, note_events
+
+    def segment_notes(self, activations, frame_offset, keep_from, keep_to, final=True):
+        """
+        Extract note events from a slice of model activations.
+
+        Args:
+            activations (dict): "note", "onset" and "contour" arrays for the slice
+            frame_offset (int): Absolute frame index of the slice's first frame
+            keep_from, keep_to (int): Absolute frame range whose onsets are kept
+            final (bool): Whether the slice's end is final (the end of the
+                audio, or as far as the caller will look ahead)
+
+        Returns:
+            list: Note events with absolute times, as returned by Basic Pitch,
+                or None if the slice isn't final and a kept note is still
+                sounding at its end, so its length isn't known yet
+        """
+        import basic_pitch.note_creation as infer
+
+        estimated_notes = infer.output_to_notes_polyphonic(
+            activations["note"],
+            activations["onset"],
+            onset_thresh=self.onset_threshold,
+            frame_thresh=self.frame_threshold,
+            infer_onsets=True,
+            min_note_len=self.min_note_len_frames,
+            min_freq=None,
+            max_freq=None,
+        )
+        # Notes starting in the margins belong to the neighbouring segments
+        estimated_notes = [
+            note for note in estimated_notes
+            if keep_from <= note[0] + frame_offset < keep_to
+        ]
+        # A note is followed until NOTE_ENERGY_TOL quiet frames or the last frame
+        n_frames = activations["note"].shape[0]
+        if not final and any(note[1] >= n_frames - 1 - NOTE_ENERGY_TOL for note in estimated_notes):
+            return None
+        with_pitch_bends = infer.get_pitch_bends(activations["contour"], estimated_notes)
+
+        # Basic Pitch's frame times depend on the absolute frame index
+        times_s = infer.model_frames_to_time(frame_offset + n_frames)[frame_offset:]
+        return [
+            (times_s[start], times_s[end], pitch, amplitude, bends)
+            for start, end, pitch, amplitude, bends in with_pitch_bends
+        ]
+
+    def iter_note_segments(self, blocks, n_samples=None, progress=None):
+        """
+        Transcribe a stream of audio blocks, yielding notes segment by segment.
+
+        Windows are cut exactly as in run_inference(). Activations are kept
+        only for the segment being decoded plus its margins and dropped once
+        its notes are extracted, so peak memory is bounded by SEGMENT_FRAMES
+        and MAX_LOOKAHEAD_FRAMES regardless of the input's length. A segment
+        whose notes run past its right margin waits for more frames, so notes
+        crossing a boundary keep their full length.
+
+        Args:
+            blocks (iterable): Mono float32 blocks at AUDIO_SAMPLE_RATE
+            n_samples (int, optional): Expected total samples, for progress
+            progress (callable, optional): progress(stage, fraction) callback
+
+        Yields:
+            tuple: (segment start and end time in seconds, note events with
+                onsets in the segment)
+        """
+        n_olap = N_OVERLAPPING_FRAMES // 2
+        frame_duration = 1.0 / ANNOTATIONS_FPS
+        n_windows = -(-(n_samples + OVERLAP_LEN // 2) // HOP_SIZE) if n_samples else None
+
+        # Same leading padding as run_inference()
+        pending = np.zeros(OVERLAP_LEN // 2, dtype=np.float32)
+        total_samples = 0
+        windows_done = 0
+        activations = {"note": [], "onset": [], "contour": []}
+        buffer_start = 0    # absolute index of the first buffered frame
+        buffered_frames = 0
+        segment_start = 0   # absolute index where the next segment begins
+
+        def flush_segment(segment_end, buffer_end, final=True):
+            """Extract and drop a segment's notes; None if a note is still sounding at buffer_end."""
+            nonlocal buffer_start, buffered_frames, segment_start
+            with span("notes"):
+                merged = {k: np.concatenate(v)[:buffer_end - buffer_start] for k, v in activations.items()}
+                notes = self.segment_notes(merged, buffer_start, segment_start, segment_end, final)
+            if notes is None:
+                # Keep the merged arrays so the retry doesn't concatenate them again
+                for k, v in merged.items():
+                    activations[k] = [v]
+                return None
+
+            # Keep only the left margin the next segment needs
+            drop = max(0, segment_end - MARGIN_FRAMES - buffer_start)
+            for k, v in merged.items():
+                activations[k] = [np.ascontiguousarray(v[drop:])]
+            buffer_start += drop
+            buffered_frames = merged["note"].shape[0] - drop
+            start_s = segment_start * frame_duration
+            segment_start = segment_end
+            return start_s, segment_end * frame_duration, notes
+
+        report(progress, "inference", 0.0)
+        exhausted = False
+        block_iter = iter(blocks)
+        while not exhausted:
+            block = next(block_iter, None)
+            if block is None:
+                exhausted = True
+            else:
+                total_samples += len(block)
+                pending = np.concatenate([pending, block])
+
+            # A full window is needed mid-stream; at the end the tail is zero-padded
+            while len(pending) >= AUDIO_N_SAMPLES or (exhausted and len(pending) > 0):
+                window = pending[:AUDIO_N_SAMPLES]
+                if len(window) < AUDIO_N_SAMPLES:
+                    window = np.pad(window, (0, AUDIO_N_SAMPLES - len(window)))
+                with span("inference"):
+                    output = self.model.predict(window[np.newaxis, :, np.newaxis])
+                for k, v in output.items():
+                    activations[k].append(v[0, n_olap:-n_olap])
+                buffered_frames += output["note"].shape[1] - 2 * n_olap
+                pending = pending[HOP_SIZE:]
+                windows_done += 1
+                if n_windows:
+                    report(progress, "inference", min(windows_done / n_windows, 1.0))
+
+            # Emit every segment whose right margin has been computed
+            while not exhausted:
+                segment_end = segment_start + (SEGMENT_FRAMES if segment_start else FIRST_SEGMENT_FRAMES)
+                buffer_end = buffer_start + buffered_frames
+                if buffer_end < segment_end + MARGIN_FRAMES:
+                    break
+                segment = flush_segment(segment_end, buffer_end,
+                                        final=buffer_end - segment_end >= MAX_LOOKAHEAD_FRAMES)
+                if segment is None:
+                    # A note is still ringing; retry once the next block is transcribed
+                    break
+                yield segment
+
+        # Final segment, trimmed to the original length like unwrap_output()
+        n_frames_total = int(np.floor(total_samples * (ANNOTATIONS_FPS / AUDIO_SAMPLE_RATE)))
+        report(progress, "inference", 1.0)
+        if n_frames_total > segment_start:
+            yield flush_segment(n_frames_total, n_frames_total)
+
+    def transcribe_stream(self, source, suffix=".mp3", progress=None, on_segment=None):
+        """
+        Decode and transcribe audio in streaming mode with bounded memory.
+
+        Args:
+            source: File path, raw bytes or a binary file-like object
+            suffix (str): Extension hint for the decoder
+            progress (callable, optional): progress(stage, fraction) callback
+            on_segment (callable, optional): on_segment(start_s, end_s, note_events)
+                called as soon as each segment's notes are known
+
+        Returns:
+            tuple: (None, midi_data, note_events); activations are not kept
+        """
+        import basic_pitch.note_creation as infer
+
+        report(progress, "decode", 0.0)
+        with span("decode"):
+            n_samples, blocks = self.open_stream(source, suffix)
+        # Blocks are decoded as inference pulls them
+        blocks = iter_span("decode", blocks)
+        report(progress, "decode", 1.0)
+
+        note_events = []
+        for start_s, end_s, notes in self.iter_note_segments(blocks, n_samples, progress):
+            note_events.extend(notes)
+            if on_segment is not None:
+                on_segment(start_s, end_s, notes)
+
+        report(progress, "notes", 0.0)
+        with span("notes"):
+            midi_data = infer.note_events_to_midi(note_events)
+        report(progress, "notes", 1.0)
+        return None, midi_data, note_events
+
+    def predict(self, source, suffix=".mp3", progress=None, on_segment=None):
+        """
+        Decode and transcribe audio with the shared model.
+
+        Args:
+            source: File path, raw bytes or a binary file-like object
+            suffix (str): Extension hint for the decoder
+            progress (callable, optional): progress(stage, fraction) callback
+            on_segment (callable, optional): on_segment(start_s, end_s, note_events)
+                for partial results; called once for the whole file when not streaming
+
+        Returns:
+            tuple: (model_output, midi_data, note_events) as returned by Basic
+                Pitch; model_output is None in streaming mode
+        """
+        if self.streaming:
+            return self.transcribe_stream(source, suffix, progress, on_segment)
+
+        report(progress, "decode", 0.0)
+        with span("decode"):
+            audio = self.decode(source, suffix)
+        report(progress, "decode", 1.0)
+        model_output, midi_data, note_events = self.transcribe(audio, progress)
+        if on_segment is not None:
+            on_segment(0.0, len(audio) / AUDIO_SAMPLE_RATE, note_events)
+        return model_output, midi_data, note_events